@@ -1,15 +1,9 @@
-from fastapi import APIRouter, Depends
+import json
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from ..db import SessionLocal
-from ..models import Workflow, Execution
-from ..utils import gen_id
-from ..engine.orchestrator import execute_node
-from ..engine.graph import first_node
-
-try:
-    from json_logic import jsonLogic
-except Exception:
-    from jsonlogic import jsonlogic as jsonLogic
+from ..engine.intake import INTAKE_MODE, append_events, ingest_events
 
 router = APIRouter(prefix="/events", tags=["events"])
 
@@ -20,21 +14,30 @@ def get_db():
     finally:
         db.close()
 
+def _parse_batch(raw: bytes, content_type: str) -> list[dict]:
+    try:
+        if "ndjson" in content_type or "jsonl" in content_type:
+            events = [json.loads(line) for line in raw.splitlines() if line.strip()]
+        else:
+            events = json.loads(raw or b"[]")
+    except ValueError as error:
+        raise HTTPException(400, f"Invalid JSON: {error}")
+    if not isinstance(events, list) or not all(isinstance(e, dict) for e in events):
+        raise HTTPException(422, "Expected a JSON array or NDJSON of event objects")
+    return events
+
 @router.post("")
-def ingest_event(event: dict, db: Session = Depends(get_db)):
-    matched = 0
-    wfs = db.query(Workflow).filter(Workflow.is_active == True).all()
-    for wf in wfs:
-        try:
-            if jsonLogic(wf.trigger or {}, event or {}):
-                matched += 1
-                exec_id = gen_id()
-                ex = Execution(id=exec_id, workflow_id=wf.id, context=event)
-                db.add(ex); db.commit()
-                start = first_node(wf.graph)
-                if start:
-                    execute_node.delay(exec_id, start)
-        except Exception:
-            # skip malformed triggers
-            continue
-    return {"matched": matched}
+def ingest_event(event: dict, response: Response, db: Session = Depends(get_db)):
+    if INTAKE_MODE == "stream":
+        response.status_code = 202
+        return {"event_id": append_events([event])[0]}
+    return {"matched": ingest_events(db, [event])}
+
+@router.post("/batch")
+async def ingest_batch(request: Request, response: Response, db: Session = Depends(get_db)):
+    events = _parse_batch(await request.body(), request.headers.get("content-type", ""))
+    if INTAKE_MODE == "stream":
+        response.status_code = 202
+        return {"events": len(events), "event_ids": await run_in_threadpool(append_events, events)}
+    matched = await run_in_threadpool(ingest_events, db, events)
+    return {"events": len(events), "matched": matched}
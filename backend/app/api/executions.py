@@ -3,8 +3,9 @@ from sqlalchemy.orm import Session
 from ..db import SessionLocal
 from ..models import Execution, Step, ExecutionStatus, Workflow
 from ..schemas import ExecutionOut, StepOut
-from ..engine.orchestrator import execute_node
-from ..engine.graph import first_node
+from ..engine.outbox import commit_and_enqueue
+from ..engine.graph import get_compiled
+from ..engine import cancellation, steplog
 import uuid
 from datetime import datetime
 from pydantic import BaseModel
@@ -35,7 +36,52 @@ def get_exec(exec_id: str, db: Session = Depends(get_db)):
 
 @router.get("/{exec_id}/steps", response_model=list[StepOut])
 def get_steps(exec_id: str, db: Session = Depends(get_db)):
-    return db.query(Step).filter(Step.execution_id == exec_id).all()
+    steps = db.query(Step).filter(Step.execution_id == exec_id).all()
+    if steplog.STEP_SINK == "stream":
+        # merge steps still waiting in the write-behind stream
+        stored = {s.id for s in steps}
+        steps += [s for s in steplog.pending_for(exec_id) if s["id"] not in stored]
+    return steps
+
+CANCEL_BATCH_SIZE = 1000
+
+def _cancel(db: Session, exec_ids: list[str]) -> int:
+    if not exec_ids:
+        return 0
+    count = (
+        db.query(Execution)
+        .filter(Execution.id.in_(exec_ids), Execution.status.in_([ExecutionStatus.PENDING, ExecutionStatus.RUNNING]))
+        .update({Execution.status: ExecutionStatus.CANCELLED, Execution.finished_at: datetime.utcnow()}, synchronize_session=False)
+    )
+    db.commit()
+    # workers and the timer poller check these flags before running anything
+    cancellation.mark_cancelled(exec_ids)
+    return count
+
+@router.post("/cancel")
+def cancel_workflow_execs(workflow_id: str, db: Session = Depends(get_db)):
+    # cancelled rows drop out of the filter, so each page starts from the top again
+    cancelled = 0
+    while True:
+        exec_ids = [
+            i for (i,) in db.query(Execution.id).filter(
+                Execution.workflow_id == workflow_id,
+                Execution.status.in_([ExecutionStatus.PENDING, ExecutionStatus.RUNNING]),
+            ).limit(CANCEL_BATCH_SIZE)
+        ]
+        if not exec_ids:
+            return {"cancelled": cancelled}
+        cancelled += _cancel(db, exec_ids)
+
+@router.post("/{exec_id}/cancel", response_model=ExecutionOut)
+def cancel_exec(exec_id: str, db: Session = Depends(get_db)):
+    ex = db.query(Execution).filter(Execution.id == exec_id).first()
+    if not ex:
+        raise HTTPException(404, "Execution not found")
+    if ex.status in (ExecutionStatus.PENDING, ExecutionStatus.RUNNING):
+        _cancel(db, [exec_id])
+        db.refresh(ex)
+    return ex
 
 class StartExecutionRequest(BaseModel):
     workflow_id: str
@@ -53,20 +99,21 @@ def start_exec(req: StartExecutionRequest, db: Session = Depends(get_db)):
     ex = Execution(
         id=exec_id,
         workflow_id=req.workflow_id,
+        workflow_version=wf.version,
         status=ExecutionStatus.PENDING,
         created_at=datetime.utcnow(),
         context=req.payload or {},
     )
     db.add(ex)
-    db.commit()
-    db.refresh(ex)
 
     # find start node and enqueue first task
-    start = first_node(wf.definition or {})
+    start = get_compiled(wf.id, wf.version, wf.definition or {}, wf.persistence).start
     if not start:
         ex.status = ExecutionStatus.FAILED
         db.commit()
         raise HTTPException(400, "Workflow graph has no start node")
 
-    execute_node.delay(exec_id, start)
+    # the first task is enqueued in the same transaction as the execution (outbox mode)
+    commit_and_enqueue(db, [(exec_id, start)])
+    db.refresh(ex)
     return ex
@@ -0,0 +1,9 @@
+from fastapi import APIRouter
+from ..engine import metrics
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+@router.get("/steps")
+def step_metrics():
+    # step counts and total durations by "node_type:status", across all workers
+    return metrics.shared_snapshot()
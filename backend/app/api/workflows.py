@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from ..db import SessionLocal
-from ..models import Workflow
+from ..models import Workflow, snapshot_version
 from ..schemas import WorkflowCreate, WorkflowOut
 from ..utils import gen_id
+from ..engine.workflow_cache import active_workflows, notify_changed
 
 router = APIRouter(prefix="/workflows", tags=["workflows"])
 
@@ -25,10 +26,14 @@ def create_workflow(body: WorkflowCreate, db: Session = Depends(get_db)):
         trigger=body.trigger,
         graph=body.graph or definition,
         is_active=body.is_active,
+        persistence=body.persistence,
+        version=1,
     )
     db.add(wf)
+    db.add(snapshot_version(wf))
     db.commit()
     db.refresh(wf)
+    notify_changed(wf.id)
     return wf
 
 @router.get("", response_model=list[WorkflowOut])
@@ -56,9 +61,12 @@ def update_workflow(workflow_id: str, body: WorkflowCreate, db: Session = Depend
     if body.graph or new_definition:
         wf.graph = body.graph or new_definition
     wf.is_active = body.is_active
+    wf.persistence = body.persistence
     wf.version += 1
+    db.add(snapshot_version(wf))
     db.commit()
     db.refresh(wf)
+    notify_changed(wf.id)
     return wf
 
 @router.delete("/{workflow_id}")
@@ -68,4 +76,6 @@ def delete_workflow(workflow_id: str, db: Session = Depends(get_db)):
         raise HTTPException(404, "Workflow not found")
     db.delete(wf)
     db.commit()
+    active_workflows.forget(workflow_id)
+    notify_changed(workflow_id)
     return {"status": "deleted"}
@@ -8,7 +8,12 @@ connect_args = {}
 if DATABASE_URL.startswith("sqlite"):
     connect_args = {"check_same_thread": False}
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True, connect_args=connect_args)
+# the asyncio runtime keeps many sessions open at once and needs a bigger pool
+pool_args = {}
+if os.getenv("DB_POOL_SIZE"):
+    pool_args = {"pool_size": int(os.getenv("DB_POOL_SIZE")), "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10"))}
+
+engine = create_engine(DATABASE_URL, pool_pre_ping=True, connect_args=connect_args, **pool_args)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 class Base(DeclarativeBase):
@@ -0,0 +1,144 @@
+import argparse
+import asyncio
+import queue
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional
+
+from loguru import logger
+from kombu import Consumer
+
+from ..models import Execution
+from .graph import CompiledGraph
+from .orchestrator import (
+    INLINE_MAX_STEPS,
+    NodeRun,
+    advance,
+    begin_node,
+    celery_app,
+    end_task,
+    fail_node,
+    finish_node,
+    start_task,
+    worker_session,
+)
+from .registry import HandlerResult, is_async, registry
+from .timeouts import NodeTimeout
+
+# asyncio runtime: consumes the same execute_node queue as the Celery worker and
+# keeps many executions in flight per process. Database work runs in a thread
+# pool; async handlers are awaited on the loop, sync handlers run in the pool.
+
+async def _invoke(run: NodeRun, exec_obj: Execution) -> HandlerResult:
+    handler = registry.get(run.type)
+    if is_async(handler):
+        call = handler.execute_async(**run.kwargs(exec_obj))
+    else:
+        call = asyncio.to_thread(handler.execute, **run.kwargs(exec_obj))
+    try:
+        return await asyncio.wait_for(call, run.timeout_ms / 1000 if run.timeout_ms else None)
+    except asyncio.TimeoutError:
+        if not is_async(handler):
+            # threads cannot be interrupted: the handler keeps running and holding a
+            # pool slot until it returns, and a retry may repeat its side effects.
+            # Give sync handlers their own I/O timeouts, or provide execute_async.
+            logger.warning(f"Sync handler {run.type} for node {run.node_id} timed out; its thread is still running")
+        raise NodeTimeout(f"node exceeded its {run.timeout_ms:.0f}ms timeout")
+
+async def _run_node(db, exec_obj: Execution, graph: CompiledGraph, node_id: str, attempt: int, deferred_since: float | None) -> Optional[List[str]]:
+    run = await asyncio.to_thread(begin_node, db, exec_obj, graph, node_id, attempt, deferred_since)
+    if not isinstance(run, NodeRun):
+        return run
+    try:
+        result = await _invoke(run, exec_obj)
+    except Exception as error:
+        return await asyncio.to_thread(fail_node, db, exec_obj, graph, run, error)
+    return await asyncio.to_thread(finish_node, db, exec_obj, graph, run, result)
+
+async def run_task(execution_id: str, node_id: str, resume_from_id: str | None = None, attempt: int = 0, deferred_since: float | None = None) -> None:
+    db = worker_session()
+    try:
+        started = await asyncio.to_thread(start_task, db, execution_id, node_id, resume_from_id)
+        if started:
+            exec_obj, graph, current = started
+            clock, budget = time.monotonic(), INLINE_MAX_STEPS
+            while current:
+                next_node_ids = await _run_node(db, exec_obj, graph, current, attempt, deferred_since)
+                if next_node_ids is None:
+                    break
+                attempt, deferred_since = 0, None
+                budget -= 1
+                current = await asyncio.to_thread(advance, db, exec_obj, graph, next_node_ids, budget, clock)
+        await asyncio.to_thread(end_task, db, execution_id)
+    finally:
+        await asyncio.to_thread(db.close)
+
+def _task_args(message: Any) -> Optional[tuple]:
+    # Celery message protocol v2: headers carry the task name, body is (args, kwargs, embed)
+    name = (message.headers or {}).get("task")
+    body = message.decode()
+    if name is None and isinstance(body, dict):
+        # protocol v1
+        name, args, kwargs = body.get("task"), body.get("args", []), body.get("kwargs", {})
+    else:
+        args, kwargs = body[0], body[1]
+    if name != "execute_node":
+        return None
+    return tuple(args), dict(kwargs)
+
+class AsyncWorker:
+    def __init__(self, concurrency: int) -> None:
+        self.concurrency = concurrency
+        self.loop = asyncio.new_event_loop()
+        self.loop.set_default_executor(ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="node"))
+        # kombu channels are not thread-safe: acks are handed back to the consumer thread
+        self._acks: "queue.SimpleQueue[Any]" = queue.SimpleQueue()
+
+    async def _handle(self, message: Any, args: tuple, kwargs: dict) -> None:
+        try:
+            await run_task(*args, **kwargs)
+        except Exception as error:
+            logger.opt(exception=error).error(f"execute_node{args} failed")
+        finally:
+            self._acks.put(message)
+
+    def _on_message(self, body: Any, message: Any) -> None:
+        parsed = _task_args(message)
+        if parsed is None:
+            logger.error(f"Unsupported task {message.headers}; rejecting")
+            message.reject(requeue=False)
+            return
+        asyncio.run_coroutine_threadsafe(self._handle(message, *parsed), self.loop)
+
+    def _consume(self) -> None:
+        queue_ = celery_app.amqp.queues[celery_app.conf.task_default_queue]
+        while True:
+            try:
+                with celery_app.connection_for_read() as conn:
+                    with Consumer(conn, queues=[queue_], callbacks=[self._on_message], accept=["json"], prefetch_count=self.concurrency):
+                        while True:
+                            while not self._acks.empty():
+                                self._acks.get().ack()
+                            try:
+                                conn.drain_events(timeout=0.1)
+                            except socket.timeout:
+                                pass
+            except Exception as error:
+                logger.warning(f"Consumer connection lost: {error}")
+                time.sleep(1)
+
+    def run(self) -> None:
+        threading.Thread(target=self._consume, name="consumer", daemon=True).start()
+        logger.info(f"Async worker running with concurrency {self.concurrency}")
+        self.loop.run_forever()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run execute_node tasks on an asyncio event loop")
+    parser.add_argument("--concurrency", type=int, default=200)
+    args = parser.parse_args()
+    AsyncWorker(args.concurrency).run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+import os
+import time
+from typing import Optional
+from urllib.parse import urlsplit
+
+from loguru import logger
+
+from ..kv import get_redis
+from ..utils import gen_id
+
+# Shared per-host guard for outbound HTTP, kept in Redis so every worker sees
+# the same state:
+#   - concurrency: in-flight calls are leased members of a sorted set; a call
+#     is refused once the host has max_concurrency live leases
+#   - circuit breaker: failures are counted in a fixed window; when the error
+#     rate trips, the host is "open" (calls fail fast) for BREAKER_OPEN_MS,
+#     then "half-open": a single probe call decides whether it closes again
+BREAKER_ENABLED = os.getenv("HTTP_BREAKER", "1") != "0"
+BREAKER_WINDOW_MS = int(os.getenv("HTTP_BREAKER_WINDOW_MS", "30000"))
+BREAKER_MIN_REQUESTS = int(os.getenv("HTTP_BREAKER_MIN_REQUESTS", "20"))
+BREAKER_ERROR_RATE = float(os.getenv("HTTP_BREAKER_ERROR_RATE", "0.5"))
+BREAKER_OPEN_MS = int(os.getenv("HTTP_BREAKER_OPEN_MS", "30000"))
+# 0 = unlimited; a node can override it with data.max_concurrency
+HOST_MAX_CONCURRENCY = int(os.getenv("HTTP_HOST_MAX_CONCURRENCY", "0"))
+# how long a slot or probe is held if its worker dies mid-call
+LEASE_MS = int(os.getenv("HTTP_HOST_LEASE_MS", "60000"))
+# wait suggested to callers refused because the host is at its cap
+BUSY_RETRY_MS = int(os.getenv("HTTP_HOST_BUSY_RETRY_MS", "500"))
+
+_ACQUIRE = """
+local ttl = redis.call('PTTL', KEYS[1])
+if ttl > 0 then
+    return {0, ttl, 1}
+end
+local probe = 0
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    if not redis.call('SET', KEYS[3], ARGV[3], 'NX', 'PX', ARGV[2]) then
+        return {0, redis.call('PTTL', KEYS[3]), 2}
+    end
+    probe = 1
+end
+local limit = tonumber(ARGV[4])
+if limit > 0 then
+    redis.call('ZREMRANGEBYSCORE', KEYS[4], '-inf', ARGV[1])
+    if redis.call('ZCARD', KEYS[4]) >= limit then
+        if probe == 1 then
+            redis.call('DEL', KEYS[3])
+        end
+        return {0, tonumber(ARGV[5]), 3}
+    end
+    redis.call('ZADD', KEYS[4], tonumber(ARGV[1]) + tonumber(ARGV[2]), ARGV[3])
+    redis.call('PEXPIRE', KEYS[4], ARGV[2])
+end
+return {1, 0, probe}
+"""
+
+_RELEASE = """
+redis.call('ZREM', KEYS[6], ARGV[7])
+if ARGV[2] == '1' then
+    redis.call('DEL', KEYS[3])
+    if ARGV[1] == '1' then
+        redis.call('DEL', KEYS[2], KEYS[4], KEYS[5])
+        return 0
+    end
+    redis.call('SET', KEYS[1], 1, 'PX', ARGV[6])
+    return 1
+end
+local total = redis.call('INCR', KEYS[4])
+if total == 1 then
+    redis.call('PEXPIRE', KEYS[4], ARGV[3])
+end
+if ARGV[1] == '1' then
+    return 0
+end
+local fails = redis.call('INCR', KEYS[5])
+if fails == 1 then
+    redis.call('PEXPIRE', KEYS[5], ARGV[3])
+end
+if total >= tonumber(ARGV[4]) and fails / total >= tonumber(ARGV[5]) then
+    redis.call('SET', KEYS[1], 1, 'PX', ARGV[6])
+    redis.call('SET', KEYS[2], 1, 'PX', 86400000)
+    redis.call('DEL', KEYS[4], KEYS[5])
+    return 1
+end
+return 0
+"""
+
+# refusal reasons returned by _ACQUIRE
+_REASONS = {1: "circuit is open", 2: "circuit is half-open and probing", 3: "is at its concurrency limit"}
+
+_acquire_script = None
+_release_script = None
+
+class HostUnavailable(Exception):
+    """The host's circuit is open or it is at its concurrency cap."""
+
+    def __init__(self, host: str, reason: str, retry_after_ms: float) -> None:
+        super().__init__(f"{host} {reason}; retry in {retry_after_ms:.0f}ms")
+        self.host = host
+        self.retry_after_ms = retry_after_ms
+
+class Permit:
+    def __init__(self, host: str, token: str, probe: bool) -> None:
+        self.host = host
+        self.token = token
+        self.probe = probe
+
+def _keys(host: str, *names: str) -> list:
+    # the {host} hash tag keeps one host's keys in the same cluster slot
+    return [f"breaker:{{{host}}}:{name}" for name in names]
+
+def host_of(url: str) -> str:
+    return urlsplit(url or "").netloc.lower()
+
+def is_failure(status_code: int) -> bool:
+    return status_code >= 500 or status_code == 429
+
+def acquire(url: str, max_concurrency: Optional[int] = None) -> Optional[Permit]:
+    """Take a call slot for url's host, or raise HostUnavailable."""
+    global _acquire_script
+    if not BREAKER_ENABLED:
+        return None
+    host = host_of(url)
+    limit = HOST_MAX_CONCURRENCY if max_concurrency is None else int(max_concurrency)
+    token = gen_id()
+    try:
+        if _acquire_script is None:
+            _acquire_script = get_redis().register_script(_ACQUIRE)
+        allowed, retry_after, flag = _acquire_script(
+            keys=_keys(host, "open", "tripped", "probe", "slots"),
+            args=[int(time.time() * 1000), LEASE_MS, token, limit, BUSY_RETRY_MS],
+        )
+    except Exception as error:
+        # without Redis the call goes ahead unguarded
+        logger.warning(f"Host guard unavailable: {error}")
+        return None
+    if not allowed:
+        raise HostUnavailable(host, _REASONS[flag], retry_after)
+    return Permit(host, token, bool(flag))
+
+def release(permit: Optional[Permit], ok: bool) -> None:
+    """Free the slot and count the outcome towards the host's error rate."""
+    global _release_script
+    if permit is None:
+        return
+    try:
+        if _release_script is None:
+            _release_script = get_redis().register_script(_RELEASE)
+        tripped = _release_script(
+            keys=_keys(permit.host, "open", "tripped", "probe", "total", "fails", "slots"),
+            args=[int(ok), int(permit.probe), BREAKER_WINDOW_MS, BREAKER_MIN_REQUESTS, BREAKER_ERROR_RATE, BREAKER_OPEN_MS, permit.token],
+        )
+    except Exception as error:
+        logger.warning(f"Host guard release failed: {error}")
+        return
+    if tripped:
+        logger.warning(f"Circuit opened for {permit.host} for {BREAKER_OPEN_MS}ms")
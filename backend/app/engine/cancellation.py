@@ -0,0 +1,33 @@
+from typing import Iterable, Set
+
+from loguru import logger
+
+from ..kv import get_redis
+
+# Redis flags mirror CANCELLED executions so workers and the timer poller can
+# check them without a database round trip.
+TTL_SECONDS = 7 * 24 * 3600
+
+def _key(execution_id: str) -> str:
+    return f"cancel:{execution_id}"
+
+def mark_cancelled(execution_ids: Iterable[str]) -> None:
+    pipe = get_redis().pipeline(transaction=False)
+    for execution_id in execution_ids:
+        pipe.set(_key(execution_id), 1, ex=TTL_SECONDS)
+    pipe.execute()
+
+def is_cancelled(execution_id: str) -> bool:
+    try:
+        return bool(get_redis().exists(_key(execution_id)))
+    except Exception as error:
+        # the task-start status check in Postgres still applies
+        logger.warning(f"Cancellation check failed: {error}")
+        return False
+
+def cancelled_among(execution_ids: Iterable[str]) -> Set[str]:
+    ids = list(execution_ids)
+    if not ids:
+        return set()
+    flags = get_redis().mget([_key(i) for i in ids])
+    return {i for i, flag in zip(ids, flags) if flag}
@@ -0,0 +1,16 @@
+from ..kv import get_redis
+
+class ArrivalCounter:
+    """Counts branch arrivals at a node of one execution with Redis INCR."""
+
+    def __init__(self, ttl_seconds: int = 7 * 24 * 3600) -> None:
+        self.ttl_seconds = ttl_seconds
+
+    def arrive(self, exec_id: str, node_id: str) -> int:
+        key = f"join:{exec_id}:{node_id}"
+        pipe = get_redis().pipeline()
+        pipe.incr(key)
+        pipe.expire(key, self.ttl_seconds)
+        return pipe.execute()[0]
+
+arrivals = ArrivalCounter()
@@ -1,4 +1,10 @@
-from typing import Optional, List, Dict, Any
+import json
+import os
+import threading
+from collections import OrderedDict, deque
+from typing import Optional, List, Dict, Any, Tuple, Callable
+
+from .templates import RAW_FIELDS, Renderer, compile_template
 
 def first_node(graph: Dict[str, Any]) -> Optional[str]:
     # try edge out of an explicit 'start' node first
@@ -7,11 +13,13 @@ def first_node(graph: Dict[str, Any]) -> Optional[str]:
         for e in graph.get("edges", []):
             if e.get("source") == start_id:
                 return e.get("target")
-    # else: find any node with no incoming edges (excluding 'start')
-    nodes = {n["id"] for n in graph.get("nodes", []) if n["id"] != "start"}
+    # else: the first node in definition order with no incoming edges (excluding 'start'),
+    # matching CompiledGraph.start
     incoming = {e["target"] for e in graph.get("edges", [])}
-    roots = list(nodes - incoming)
-    return roots[0] if roots else None
+    for n in graph.get("nodes", []):
+        if n["id"] != "start" and n["id"] not in incoming:
+            return n["id"]
+    return None
 
 def next_nodes(node_id: str, graph: Dict[str, Any]) -> List[str]:
     return [e["target"] for e in graph.get("edges", []) if e.get("source") == node_id]
@@ -21,3 +29,106 @@ def find_node(node_id: str, graph: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         if n.get("id") == node_id:
             return n
     return None
+
+class CompiledGraph:
+    """Graph indexed for O(1) node lookup and out-edge traversal."""
+
+    def __init__(self, graph: Dict[str, Any], key: Optional[Tuple[str, int]] = None, persistence: Optional[str] = None) -> None:
+        # (workflow_id, version) when loaded through the graph cache
+        self.key = key
+        self.nodes: Dict[str, Dict[str, Any]] = {}
+        for n in graph.get("nodes", []):
+            self.nodes.setdefault(n["id"], n)
+        self.out_edges: Dict[str, List[str]] = {}
+        self.in_degree: Dict[str, int] = {node_id: 0 for node_id in self.nodes}
+        for e in graph.get("edges", []):
+            self.out_edges.setdefault(e.get("source"), []).append(e["target"])
+            self.in_degree[e["target"]] = self.in_degree.get(e["target"], 0) + 1
+        self.start = self._start()
+        self.order = self._topological_order()
+        # step persistence level of the workflow version ("full", "summary" or "ephemeral")
+        self.persistence: str = persistence or "full"
+        # execution deadline, measured from when the execution was created
+        self.timeout_ms: Optional[int] = graph.get("timeout_ms")
+        # renderers for nodes whose data holds {{ }} placeholders
+        self.templates: Dict[str, Renderer] = {}
+        for node_id, node in self.nodes.items():
+            render = compile_template(node.get("data"), raw_fields=RAW_FIELDS)
+            if render:
+                self.templates[node_id] = render
+
+    def _start(self) -> Optional[str]:
+        if "start" in self.nodes and self.out_edges.get("start"):
+            return self.out_edges["start"][0]
+        for node_id in self.nodes:
+            if node_id != "start" and not self.in_degree.get(node_id):
+                return node_id
+        return None
+
+    def _topological_order(self) -> List[str]:
+        # Kahn's algorithm; nodes on cycles are appended in definition order
+        remaining = dict(self.in_degree)
+        queue = deque(n for n, d in remaining.items() if d == 0)
+        order: List[str] = []
+        while queue:
+            node_id = queue.popleft()
+            order.append(node_id)
+            for target in self.out_edges.get(node_id, []):
+                remaining[target] -= 1
+                if remaining[target] == 0:
+                    queue.append(target)
+        seen = set(order)
+        order.extend(n for n in self.nodes if n not in seen)
+        return order
+
+    def find_node(self, node_id: str) -> Optional[Dict[str, Any]]:
+        return self.nodes.get(node_id)
+
+    def next_nodes(self, node_id: str) -> List[str]:
+        return self.out_edges.get(node_id, [])
+
+    def node_data(self, node_id: str, scope: Dict[str, Any]) -> Dict[str, Any]:
+        render = self.templates.get(node_id)
+        if render:
+            return render(scope)
+        return (self.nodes.get(node_id) or {}).get("data") or {}
+
+class GraphCache:
+    """LRU of compiled graphs keyed by (workflow_id, version), bounded by approximate JSON size."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[CompiledGraph, int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, int]) -> Optional[CompiledGraph]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: Tuple[str, int], graph: Dict[str, Any], persistence: Optional[str] = None) -> CompiledGraph:
+        compiled = CompiledGraph(graph or {}, key, persistence)
+        size = len(json.dumps(graph, default=str))
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old:
+                self._bytes -= old[1]
+            self._entries[key] = (compiled, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+        return compiled
+
+    def get_or_load(self, key: Tuple[str, int], load: Callable[[], Tuple[Dict[str, Any], Optional[str]]]) -> CompiledGraph:
+        # load returns (definition, persistence level)
+        return self.get(key) or self.put(key, *load())
+
+graph_cache = GraphCache(int(os.getenv("GRAPH_CACHE_MAX_BYTES", str(64 * 1024 * 1024))))
+
+def get_compiled(workflow_id: str, version: int, graph: Dict[str, Any], persistence: Optional[str] = None) -> CompiledGraph:
+    return graph_cache.get_or_load((workflow_id, version), lambda: (graph, persistence))
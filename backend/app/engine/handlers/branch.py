@@ -8,6 +8,7 @@ from ..registry import NodeHandler, HandlerResult, Services
 
 class BranchHandler:
     type = "branch"
+    inline = True
 
     def execute(self, *, node_id: str, data: dict, exec_id: str, payload: dict | None, services: Services) -> HandlerResult:
         cases = data.get("cases", [])
@@ -21,7 +21,7 @@
 
 
 from ..registry import NodeHandler, HandlerResult, Services
-from ..graph import next_nodes
+from ..timers import schedule
 
 class DelayHandler:
     type = "delay"
@@ -39,14 +39,9 @@ class DelayHandler:
         if ms <= 0:
             return HandlerResult()
 
-        # 🔥 lazy import to avoid circular dependency
-        from ..orchestrator import execute_node
-
-        # schedule next node after delay
-        execute_node.apply_async(
-            args=[exec_id, "__RESUME_AFTER__", node_id],
-            countdown=ms / 1000.0,
-        )
-        return HandlerResult(halted=True)
+        # persist the resume in the timer set instead of a countdown
+        # message that would sit in worker memory until it is due
+        timer_id = schedule(ms, exec_id, "__RESUME_AFTER__", node_id)
+        return HandlerResult(result={"timer_id": timer_id}, halted=True)
 
 handler = DelayHandler()
@@ -1,31 +1,139 @@
+import asyncio
+import json
+import os
 import requests
-from ..registry import NodeHandler, HandlerResult, Services
+from .. import breaker, singleflight
+from ..http_cache import response_cache, policy as cache_policy, cache_key, key_headers, cacheable_ttl_ms, bypass
+from ..registry import NodeHandler, HandlerResult, Services, DeferNode
+
+# identical in-flight requests share one call (per node: data.coalesce = false | true | {"shared": true, "wait_ms": 5000})
+COALESCE = os.getenv("HTTP_COALESCE", "1") == "1"
+COALESCE_SHARED = os.getenv("HTTP_COALESCE_SHARED", "0") == "1"
+COALESCE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+def _encode(resp) -> str:
+    # just what the handler reads, for followers in other workers
+    return json.dumps({"status_code": resp.status_code, "text": resp.text[:500], "url": str(resp.url), "cache_control": resp.headers.get("Cache-Control")})
+
+def _decode(raw: bytes) -> requests.Response:
+    shared = json.loads(raw)
+    resp = requests.Response()
+    resp.status_code = shared["status_code"]
+    resp._content = shared["text"].encode()
+    resp.encoding = "utf-8"
+    resp.url = shared["url"]
+    if shared["cache_control"]:
+        resp.headers["Cache-Control"] = shared["cache_control"]
+    return resp
 
 class HttpCallHandler:
     type = "http_call"
 
-    def execute(self, *, node_id: str, data: dict, exec_id: str, payload: dict | None, services: Services) -> HandlerResult:
+    def _prepare(self, data: dict):
+        # url, headers and body arrive with {{ }} placeholders already rendered
         method = data.get("method", "GET").upper()
-        url = data.get("url")
-        headers = data.get("headers", {}) or {}
-        body = data.get("body")
-        # naive templating: replace {{payload.xxx}} tokens in url/body
-        def tpl(s: str) -> str:
-            if not isinstance(s, str): return s
-            out = s
-            if payload:
-                # very simple dot access for one level
-                import re
-                for m in re.findall(r"{{\s*payload\.([a-zA-Z0-9_\.]+)\s*}}", s):
-                    cur = payload
-                    for part in m.split("."):
-                        cur = cur.get(part, None) if isinstance(cur, dict) else None
-                    out = out.replace("{{payload."+m+"}}", str(cur))
-            return out
-        url = tpl(url)
-        if isinstance(body, str):
-            body = tpl(body)
-        resp = requests.request(method, url, headers=headers, json=body if isinstance(body, dict) else None, data=None if isinstance(body, dict) else body, timeout=20)
-        return HandlerResult(result={"status_code": resp.status_code, "text": resp.text[:500]})
-        
+        return method, data.get("url"), data.get("headers", {}) or {}, data.get("body")
+
+    def _cache(self, node_id: str, data: dict, services: Services, method: str, url: str, headers: dict, body):
+        """(namespace, key, policy) when the node caches responses, else None."""
+        policy = cache_policy(data.get("cache"))
+        if not policy:
+            return None
+        graph_key = getattr(services.graph, "key", None)
+        namespace = f"{graph_key[0] if graph_key else ''}:{node_id}"
+        return namespace, cache_key(method, url, headers, body, key_headers(headers, policy.vary)), policy
+
+    def _coalesce(self, data: dict, method: str, url: str, headers: dict, body):
+        """(key, shared, wait_ms) when identical concurrent requests may share one call, else None."""
+        spec = data.get("coalesce", COALESCE)
+        if not spec or method not in COALESCE_METHODS:
+            return None
+        spec = spec if isinstance(spec, dict) else {}
+        # every header is part of the key, so requests with different credentials never share
+        key = cache_key(method, url, headers, body, sorted(str(h).lower() for h in headers))
+        return key, bool(spec.get("shared", COALESCE_SHARED)), float(spec.get("wait_ms", singleflight.WAIT_MS))
+
+    def _store(self, cache, resp) -> None:
+        if cache:
+            namespace, key, policy = cache
+            ttl_ms = cacheable_ttl_ms(resp.status_code, resp.headers.get("Cache-Control"), policy.ttl_ms)
+            if ttl_ms:
+                response_cache.put(namespace, key, policy, self._result(resp), ttl_ms)
+
+    def _result(self, resp) -> dict:
+        return {"status_code": resp.status_code, "text": resp.text[:500]}
+
+    def _acquire(self, data: dict, url: str):
+        try:
+            return breaker.acquire(url, data.get("max_concurrency"))
+        except breaker.HostUnavailable as error:
+            # "defer" parks the step until the host is expected back; "fail" hands it to the retry policy
+            if data.get("on_unavailable", "defer") == "defer":
+                raise DeferNode(error.retry_after_ms, str(error)) from error
+            raise
+
+    def execute(self, *, node_id: str, data: dict, exec_id: str, payload: dict | None, services: Services) -> HandlerResult:
+        method, url, headers, body = self._prepare(data)
+        cache = self._cache(node_id, data, services, method, url, headers, body)
+        if cache and not bypass(headers):
+            cached = response_cache.get(*cache)
+            if cached is not None:
+                return HandlerResult(result={**cached, "cached": True})
+
+        def fetch():
+            permit = self._acquire(data, url)
+            ok = False
+            try:
+                resp = services.http.request(method, url, headers=headers, json=body if isinstance(body, dict) else None, data=None if isinstance(body, dict) else body)
+                ok = not breaker.is_failure(resp.status_code)
+            finally:
+                breaker.release(permit, ok)
+            self._store(cache, resp)
+            return resp
+
+        flight = self._coalesce(data, method, url, headers, body)
+        if flight:
+            key, shared, wait_ms = flight
+            call = (lambda: singleflight.shared_do(key, fetch, _encode, _decode, wait_ms)) if shared else fetch
+            resp = singleflight.flights.do(key, call)
+        else:
+            resp = fetch()
+        if data.get("raise_for_status"):
+            # turn 4xx/5xx into an HTTPError so a retry policy can act on it
+            resp.raise_for_status()
+        return HandlerResult(result=self._result(resp))
+
+    async def execute_async(self, *, node_id: str, data: dict, exec_id: str, payload: dict | None, services: Services) -> HandlerResult:
+        method, url, headers, body = self._prepare(data)
+        cache = self._cache(node_id, data, services, method, url, headers, body)
+        if cache and not bypass(headers):
+            # the shared tier and the guard talk to Redis synchronously, keep them off the event loop
+            cached = await asyncio.to_thread(response_cache.get, *cache)
+            if cached is not None:
+                return HandlerResult(result={**cached, "cached": True})
+
+        async def fetch():
+            permit = await asyncio.to_thread(self._acquire, data, url)
+            ok = False
+            try:
+                resp = await services.http.arequest(method, url, headers=headers, json=body if isinstance(body, dict) else None, content=None if isinstance(body, dict) else body)
+                ok = not breaker.is_failure(resp.status_code)
+            finally:
+                await asyncio.to_thread(breaker.release, permit, ok)
+            await asyncio.to_thread(self._store, cache, resp)
+            return resp
+
+        flight = self._coalesce(data, method, url, headers, body)
+        if flight:
+            key, shared, wait_ms = flight
+            call = (lambda: singleflight.shared_do_async(key, fetch, _encode, _decode, wait_ms)) if shared else fetch
+            resp = await singleflight.flights.do_async(key, call)
+        else:
+            resp = await fetch()
+        if data.get("raise_for_status"):
+            # httpx.HTTPStatusError subclasses httpx.HTTPError, so retry_on "HTTPError" covers both runtimes
+            # (a response shared from another worker raises requests.HTTPError)
+            resp.raise_for_status()
+        return HandlerResult(result=self._result(resp))
+
 handler = HttpCallHandler()
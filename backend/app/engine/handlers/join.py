@@ -0,0 +1,21 @@
+from ..registry import NodeHandler, HandlerResult, Services
+
+class JoinHandler:
+    type = "join"
+    inline = True
+
+    def execute(self, *, node_id: str, data: dict, exec_id: str, payload: dict | None, services: Services) -> HandlerResult:
+        # mode: "all" (every incoming edge), "n" (data.count arrivals) or "first"
+        mode = data.get("mode", "all")
+        if mode == "first":
+            expected = 1
+        elif mode == "n":
+            expected = int(data.get("count", 1))
+        else:
+            expected = services.graph.in_degree.get(node_id, 1) if services.graph else 1
+        arrived = services.arrivals.arrive(exec_id, node_id)
+        released = arrived == expected
+        # exactly one arrival releases the join; every other branch ends here
+        return HandlerResult(result={"arrived": arrived, "expected": expected, "released": released}, stop=not released)
+
+handler = JoinHandler()
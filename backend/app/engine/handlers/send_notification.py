@@ -2,6 +2,7 @@ from ..registry import NodeHandler, HandlerResult, Services
 
 class SendNotificationHandler:
     type = "send_notification"
+    inline = True
 
     def execute(self, *, node_id: str, data: dict, exec_id: str, payload: dict | None, services: Services) -> HandlerResult:
         # For demo: print; in real life: integrate Slack/Email/SMS
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from ..kv import get_redis
+
+# Opt-in response cache for http_call, enabled per node with data.cache:
+#   true, or {"ttl_ms": 60000, "max_entries": 1000, "vary": ["Authorization"], "shared": false}
+# Entries are keyed by method, rendered URL, the "vary" request headers, any
+# credential-like headers (so callers with different credentials never share
+# an entry) and a hash of the body. Each node has its own in-process LRU;
+# "shared" also reads and writes a Redis tier so workers fill the cache for
+# each other; a shared entry is only used while it is younger than the reading
+# node's ttl_ms.
+# Only 2xx responses are stored, for no longer than their Cache-Control allows.
+DEFAULT_TTL_MS = int(os.getenv("HTTP_CACHE_TTL_MS", "60000"))
+DEFAULT_MAX_ENTRIES = int(os.getenv("HTTP_CACHE_MAX_ENTRIES", "1000"))
+DEFAULT_SHARED = os.getenv("HTTP_CACHE_SHARED", "0") == "1"
+KEY_PREFIX = "httpcache:"
+CREDENTIAL_HEADERS = {"authorization", "proxy-authorization", "cookie"}
+CREDENTIAL_MARKERS = ("auth", "token", "key", "secret", "session", "signature")
+
+class CachePolicy:
+    def __init__(self, ttl_ms: float, max_entries: int, vary: List[str], shared: bool) -> None:
+        self.ttl_ms = ttl_ms
+        self.max_entries = max_entries
+        self.vary = [h.lower() for h in vary]
+        self.shared = shared
+
+def policy(spec: Any) -> Optional[CachePolicy]:
+    if not spec:
+        return None
+    spec = spec if isinstance(spec, dict) else {}
+    return CachePolicy(
+        float(spec.get("ttl_ms", DEFAULT_TTL_MS)),
+        int(spec.get("max_entries", DEFAULT_MAX_ENTRIES)),
+        spec.get("vary") or [],
+        bool(spec.get("shared", DEFAULT_SHARED)),
+    )
+
+def key_headers(headers: Dict[str, Any], vary: List[str]) -> List[str]:
+    """The vary headers plus every credential-like header present on the request."""
+    names = set(vary)
+    for name in headers or {}:
+        lowered = str(name).lower()
+        if lowered in CREDENTIAL_HEADERS or any(m in lowered for m in CREDENTIAL_MARKERS):
+            names.add(lowered)
+    return sorted(names)
+
+def cache_key(method: str, url: str, headers: Dict[str, Any], body: Any, vary: List[str]) -> str:
+    lowered = {str(k).lower(): v for k, v in (headers or {}).items()}
+    raw = body if isinstance(body, str) else json.dumps(body, sort_keys=True, default=str)
+    parts = [method, url, [lowered.get(h) for h in vary], hashlib.sha256(raw.encode()).hexdigest()]
+    return hashlib.sha256(json.dumps(parts, default=str).encode()).hexdigest()
+
+def cacheable_ttl_ms(status_code: int, cache_control: Optional[str], ttl_ms: float) -> Optional[float]:
+    """How long a response may be kept, or None when it must not be stored."""
+    if not 200 <= status_code < 300:
+        return None
+    directives: Dict[str, Optional[str]] = {}
+    for item in (cache_control or "").split(","):
+        name, _, value = item.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip('"') or None
+    # entries are shared between executions, so "private" responses are not kept either
+    if {"no-store", "no-cache", "private"} & directives.keys():
+        return None
+    max_age = directives.get("s-maxage") or directives.get("max-age")
+    if max_age is not None:
+        try:
+            ttl_ms = min(ttl_ms, int(max_age) * 1000)
+        except ValueError:
+            pass
+    return ttl_ms if ttl_ms > 0 else None
+
+def bypass(headers: Dict[str, Any]) -> bool:
+    # a request sent with Cache-Control: no-cache always goes to the origin
+    for name, value in (headers or {}).items():
+        if str(name).lower() == "cache-control" and "no-cache" in str(value).lower():
+            return True
+    return False
+
+class ResponseCache:
+    """Per-node LRUs of (expires_at, result), with an optional Redis tier."""
+
+    def __init__(self) -> None:
+        self._lrus: Dict[str, "OrderedDict[str, Tuple[float, dict]]"] = {}
+        self._lock = threading.Lock()
+
+    def get(self, namespace: str, key: str, policy: CachePolicy) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            lru = self._lrus.get(namespace)
+            entry = lru.get(key) if lru is not None else None
+            if entry is not None:
+                if entry[0] > now:
+                    lru.move_to_end(key)
+                    return entry[1]
+                del lru[key]
+        if not policy.shared:
+            return None
+        try:
+            raw = get_redis().get(KEY_PREFIX + key)
+        except Exception as error:
+            logger.warning(f"Shared HTTP cache read failed: {error}")
+            return None
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        if len(entry) != 3:
+            # written before entries carried their write time
+            return None
+        stored_at, expires_at, result = entry
+        # the writer may be a node with a longer ttl_ms: hold the entry to this node's
+        expires_at = min(expires_at, stored_at + policy.ttl_ms / 1000)
+        if expires_at <= now:
+            return None
+        self._store(namespace, key, policy, expires_at, result)
+        return result
+
+    def put(self, namespace: str, key: str, policy: CachePolicy, result: dict, ttl_ms: float) -> None:
+        stored_at = time.time()
+        expires_at = stored_at + ttl_ms / 1000
+        self._store(namespace, key, policy, expires_at, result)
+        if policy.shared:
+            try:
+                get_redis().set(KEY_PREFIX + key, json.dumps([stored_at, expires_at, result]), px=int(ttl_ms))
+            except Exception as error:
+                logger.warning(f"Shared HTTP cache write failed: {error}")
+
+    def _store(self, namespace: str, key: str, policy: CachePolicy, expires_at: float, result: dict) -> None:
+        with self._lock:
+            lru = self._lrus.setdefault(namespace, OrderedDict())
+            lru[key] = (expires_at, result)
+            lru.move_to_end(key)
+            while len(lru) > policy.max_entries:
+                lru.popitem(last=False)
+
+response_cache = ResponseCache()
@@ -0,0 +1,51 @@
+import os
+import threading
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+# keep-alive pools shared by every http_call in a worker process
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT_SECONDS", "20"))
+# number of distinct hosts whose pools are kept, and idle connections kept per host
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "32"))
+HTTP_POOL_PER_HOST = int(os.getenv("HTTP_POOL_PER_HOST", "16"))
+# asyncio runtime only: cap on open connections across all hosts
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "200"))
+
+class HttpClient:
+    """Lazily builds one pooled client per process, so pools are created after a prefork worker forks."""
+
+    def __init__(self) -> None:
+        self._session: requests.Session | None = None
+        self._async: httpx.AsyncClient | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self) -> requests.Session:
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    s = requests.Session()
+                    # pool_block=False: past the per-host limit extra connections are opened and discarded, not queued
+                    adapter = HTTPAdapter(pool_connections=HTTP_POOL_HOSTS, pool_maxsize=HTTP_POOL_PER_HOST)
+                    s.mount("http://", adapter)
+                    s.mount("https://", adapter)
+                    self._session = s
+        return self._session
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        # bound to the event loop that first uses it; the asyncio runtime runs a single loop
+        if self._async is None:
+            limits = httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_POOL_HOSTS * HTTP_POOL_PER_HOST)
+            self._async = httpx.AsyncClient(timeout=HTTP_TIMEOUT, limits=limits)
+        return self._async
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", HTTP_TIMEOUT)
+        return self.session.request(method, url, **kwargs)
+
+    async def arequest(self, method: str, url: str, **kwargs) -> httpx.Response:
+        return await self.async_client.request(method, url, **kwargs)
+
+http_client = HttpClient()
@@ -0,0 +1,105 @@
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+from typing import Any, Dict, List
+
+from loguru import logger
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from ..db import SessionLocal
+from ..kv import get_redis
+from ..models import Execution
+from ..utils import gen_id
+from .outbox import commit_and_enqueue
+from .triggers import matches
+from .workflow_cache import active_workflows
+
+# "sync" matches inside the request; "stream" appends to a Redis Stream for matcher workers
+INTAKE_MODE = os.getenv("EVENT_INTAKE_MODE", "sync")
+STREAM = os.getenv("EVENT_STREAM", "events:intake")
+GROUP = "matchers"
+STREAM_MAXLEN = int(os.getenv("EVENT_STREAM_MAXLEN", "1000000"))
+# entries unacked this long (e.g. their matcher died) are claimed by another matcher
+CLAIM_IDLE_MS = int(os.getenv("EVENT_STREAM_CLAIM_IDLE_MS", "60000"))
+
+def ingest_events(db: Session, events: List[Dict[str, Any]]) -> int:
+    rows, starts = [], []
+    for event in events:
+        for wf in active_workflows.candidates(db, event):
+            if not matches(wf, event):
+                continue
+            exec_id = gen_id()
+            rows.append({"id": exec_id, "workflow_id": wf.id, "workflow_version": wf.version, "context": event})
+            if wf.start:
+                starts.append((exec_id, wf.start))
+    if rows:
+        # one multi-row INSERT and one commit for everything matched
+        db.execute(insert(Execution), rows)
+        commit_and_enqueue(db, starts)
+    return len(rows)
+
+def append_events(events: List[Dict[str, Any]]) -> List[str]:
+    pipe = get_redis().pipeline(transaction=False)
+    for event in events:
+        pipe.xadd(STREAM, {"event": json.dumps(event)}, maxlen=STREAM_MAXLEN, approximate=True)
+    return [i.decode() if isinstance(i, bytes) else i for i in pipe.execute()]
+
+def _ensure_group() -> None:
+    try:
+        get_redis().xgroup_create(STREAM, GROUP, id="0", mkstream=True)
+    except Exception as error:
+        if "BUSYGROUP" not in str(error):
+            raise
+
+def _process(entries: List[Any], consumer: str) -> None:
+    if not entries:
+        return
+    ids, events = [], []
+    for entry_id, fields in entries:
+        ids.append(entry_id)
+        try:
+            events.append(json.loads(fields[b"event"]))
+        except (KeyError, TypeError, ValueError):
+            logger.warning(f"Dropping malformed stream entry {entry_id}")
+    db = SessionLocal()
+    try:
+        matched = ingest_events(db, events)
+    finally:
+        db.close()
+    # ack only after executions are committed (at-least-once)
+    get_redis().xack(STREAM, GROUP, *ids)
+    logger.info(f"[{consumer}] {len(events)} events, {matched} executions")
+
+def run_matcher(consumer: str, batch_size: int = 500, block_ms: int = 1000) -> None:
+    r = get_redis()
+    _ensure_group()
+    while True:
+        try:
+            claimed = r.xautoclaim(STREAM, GROUP, consumer, CLAIM_IDLE_MS, count=batch_size)[1]
+            _process(claimed, consumer)
+            resp = r.xreadgroup(GROUP, consumer, {STREAM: ">"}, count=batch_size, block=block_ms)
+            for _, entries in resp or []:
+                _process(entries, consumer)
+        except Exception as error:
+            logger.exception(error)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Consume the event stream and create executions")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    base = f"{socket.gethostname()}-{os.getpid()}"
+    procs = [
+        multiprocessing.Process(target=run_matcher, args=(f"{base}-{i}", args.batch_size), daemon=True)
+        for i in range(args.workers)
+    ]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+
+if __name__ == "__main__":
+    main()
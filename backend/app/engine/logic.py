@@ -0,0 +1,234 @@
+from functools import reduce
+from typing import Any, Callable, Dict, List
+
+from loguru import logger
+
+# Compiles JSONLogic rules into nested Python closures so a rule is parsed once
+# and evaluated many times. Operator semantics follow the json-logic package.
+
+Evaluator = Callable[[Dict[str, Any]], Any]
+
+_MISSING = object()
+
+def soft_equals(a, b) -> bool:
+    if isinstance(a, str) or isinstance(b, str):
+        return str(a) == str(b)
+    if isinstance(a, bool) or isinstance(b, bool):
+        return bool(a) is bool(b)
+    return a == b
+
+def hard_equals(a, b) -> bool:
+    if type(a) != type(b):
+        return False
+    return a == b
+
+def less(a, b, *args) -> bool:
+    types = {type(a), type(b)}
+    if float in types or int in types:
+        try:
+            a, b = float(a), float(b)
+        except (TypeError, ValueError):
+            return False
+    return a < b and (not args or less(b, *args))
+
+def less_or_equal(a, b, *args) -> bool:
+    return (less(a, b) or soft_equals(a, b)) and (not args or less_or_equal(b, *args))
+
+def to_numeric(arg):
+    if isinstance(arg, str):
+        return float(arg) if "." in arg else int(arg)
+    return arg
+
+def _if(*args):
+    for i in range(0, len(args) - 1, 2):
+        if args[i]:
+            return args[i + 1]
+    return args[-1] if len(args) % 2 else None
+
+def _merge(*args) -> list:
+    out: list = []
+    for arg in args:
+        if isinstance(arg, (list, tuple)):
+            out.extend(arg)
+        else:
+            out.append(arg)
+    return out
+
+def _log(a):
+    logger.info(f"JSONLogic log: {a}")
+    return a
+
+def _substr(source, start, length=None):
+    return source[start:][:length]
+
+def _method(obj, name, args=()):
+    # private attributes stay out of reach of workflow rules
+    if str(name).startswith("_"):
+        raise ValueError(f"JSONLogic method {name} is not allowed")
+    attr = getattr(obj, str(name))
+    return attr(*args) if callable(attr) else attr
+
+OPERATIONS: Dict[str, Callable[..., Any]] = {
+    "==": soft_equals,
+    "===": hard_equals,
+    "!=": lambda a, b: not soft_equals(a, b),
+    "!==": lambda a, b: not hard_equals(a, b),
+    ">": lambda a, b: less(b, a),
+    ">=": lambda a, b: less(b, a) or soft_equals(a, b),
+    "<": less,
+    "<=": less_or_equal,
+    "!": lambda a: not a,
+    "!!": bool,
+    "%": lambda a, b: a % b,
+    "?:": lambda a, b, c: b if a else c,
+    "if": _if,
+    "in": lambda a, b: a in b if hasattr(b, "__contains__") else False,
+    "cat": lambda *args: "".join(str(arg) for arg in args),
+    "+": lambda *args: sum(to_numeric(arg) for arg in args),
+    "*": lambda *args: reduce(lambda total, arg: total * float(arg), args, 1),
+    "-": lambda a, b=None: -to_numeric(a) if b is None else to_numeric(a) - to_numeric(b),
+    "/": lambda a, b=None: a if b is None else float(a) / float(b),
+    "min": lambda *args: min(args),
+    "max": lambda *args: max(args),
+    "merge": _merge,
+    "count": lambda *args: sum(1 if a else 0 for a in args),
+    "log": _log,
+    "substr": _substr,
+    "method": _method,
+}
+
+def var_path(name: Any) -> List[str]:
+    return str(name).split(".") if name not in (None, "") else []
+
+def lookup(data: Any, path: List[str], default: Any = None) -> Any:
+    try:
+        for key in path:
+            try:
+                data = data[key]
+            except TypeError:
+                data = data[int(key)]
+    except (KeyError, IndexError, TypeError, ValueError):
+        return default
+    return data
+
+def _const(value: Any) -> Evaluator:
+    return lambda data: value
+
+def _compile_var(args: List[Any]) -> Evaluator:
+    name = args[0] if args else None
+    default = args[1] if len(args) > 1 else None
+    if isinstance(name, dict) or isinstance(default, dict):
+        name_fn = compile_logic(name)
+        default_fn = compile_logic(default)
+        return lambda data: lookup(data, var_path(name_fn(data)), default_fn(data))
+    path = var_path(name)
+    if len(path) == 1:
+        key = path[0]
+        def single(data):
+            value = data.get(key, _MISSING) if isinstance(data, dict) else _MISSING
+            return lookup(data, path, default) if value is _MISSING else value
+        return single
+    return lambda data: lookup(data, path, default)
+
+def _compile_missing(args: List[Evaluator]) -> Evaluator:
+    def missing(data):
+        names = [fn(data) for fn in args]
+        if names and isinstance(names[0], list):
+            names = names[0]
+        return [n for n in names if lookup(data, var_path(n), _MISSING) in (_MISSING, None, "")]
+    return missing
+
+def _compile_missing_some(args: List[Evaluator]) -> Evaluator:
+    def missing_some(data):
+        need, names = args[0](data), args[1](data)
+        missing = [n for n in names if lookup(data, var_path(n), _MISSING) in (_MISSING, None, "")]
+        return [] if len(names) - len(missing) >= need else missing
+    return missing_some
+
+def _compile_and(args: List[Evaluator]) -> Evaluator:
+    if len(args) == 2:
+        a, b = args
+        return lambda data: a(data) and b(data)
+    def and_(data):
+        value: Any = True
+        for fn in args:
+            value = fn(data)
+            if not value:
+                return value
+        return value
+    return and_
+
+def _compile_or(args: List[Evaluator]) -> Evaluator:
+    def or_(data):
+        value: Any = False
+        for fn in args:
+            value = fn(data)
+            if value:
+                return value
+        return value
+    return or_
+
+def _compile_scoped(operator: str, args: List[Evaluator]) -> Evaluator:
+    # the second argument runs against each item instead of the outer data
+    items_fn = args[0] if args else _const(None)
+    fn = args[1] if len(args) > 1 else _const(None)
+    if operator == "reduce":
+        initial_fn = args[2] if len(args) > 2 else _const(None)
+        def reduce_(data):
+            items, initial = items_fn(data), initial_fn(data)
+            if not isinstance(items, (list, tuple)):
+                return initial
+            return reduce(lambda acc, cur: fn({"accumulator": acc, "current": cur}), items, initial)
+        return reduce_
+    def scoped(data):
+        items = items_fn(data)
+        if not isinstance(items, (list, tuple)):
+            items = []
+        if operator == "map":
+            return [fn(item) for item in items]
+        if operator == "filter":
+            return [item for item in items if fn(item)]
+        if operator == "all":
+            return bool(items) and all(fn(item) for item in items)
+        if operator == "some":
+            return any(fn(item) for item in items)
+        return not any(fn(item) for item in items)
+    return scoped
+
+SCOPED = {"map", "filter", "reduce", "all", "some", "none"}
+
+def compile_logic(rule: Any) -> Evaluator:
+    """Compile a JSONLogic rule into a callable taking the data dict."""
+    if isinstance(rule, list):
+        items = [compile_logic(r) for r in rule]
+        return lambda data: [fn(data) for fn in items]
+    if not isinstance(rule, dict):
+        return _const(rule)
+    if len(rule) != 1:
+        raise ValueError(f"JSONLogic rule must have exactly one operator, got {list(rule)}")
+    operator, values = next(iter(rule.items()))
+    if not isinstance(values, (list, tuple)):
+        values = [values]
+    if operator == "var":
+        return _compile_var(list(values))
+    args = [compile_logic(v) for v in values]
+    if operator == "missing":
+        return _compile_missing(args)
+    if operator == "missing_some":
+        return _compile_missing_some(args)
+    if operator == "and":
+        return _compile_and(args)
+    if operator == "or":
+        return _compile_or(args)
+    if operator in SCOPED:
+        return _compile_scoped(operator, args)
+    if operator not in OPERATIONS:
+        raise ValueError(f"Unrecognized operation {operator}")
+    op = OPERATIONS[operator]
+    if len(args) == 1:
+        a = args[0]
+        return lambda data: op(a(data))
+    if len(args) == 2:
+        a, b = args
+        return lambda data: op(a(data), b(data))
+    return lambda data: op(*[fn(data) for fn in args])
@@ -0,0 +1,67 @@
+import os
+import threading
+import time
+from collections import Counter
+from typing import Dict, Tuple
+
+from loguru import logger
+
+from ..kv import get_redis
+
+# in-process step counters; the only record of steps run at "ephemeral" persistence.
+# Deltas are added to a Redis hash every FLUSH_SECONDS so the API can report
+# totals across all workers.
+FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+KEY = "metrics:steps"
+
+_lock = threading.Lock()
+_steps: Counter = Counter()
+_duration_ms: Dict[Tuple[str, str], float] = {}
+# not yet added to the shared hash
+_pending: Counter = Counter()
+_pending_ms: Dict[Tuple[str, str], float] = {}
+_flushed_at = time.monotonic()
+
+def record_step(node_type: str, status: str, duration_ms: float) -> None:
+    key = (node_type, status)
+    with _lock:
+        _steps[key] += 1
+        _duration_ms[key] = _duration_ms.get(key, 0.0) + duration_ms
+        _pending[key] += 1
+        _pending_ms[key] = _pending_ms.get(key, 0.0) + duration_ms
+        due = time.monotonic() - _flushed_at >= FLUSH_SECONDS
+    if due:
+        flush()
+
+def flush() -> None:
+    global _pending, _pending_ms, _flushed_at
+    with _lock:
+        pending, pending_ms = _pending, _pending_ms
+        _pending, _pending_ms = Counter(), {}
+        _flushed_at = time.monotonic()
+    if not pending:
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for (node_type, status), count in pending.items():
+            pipe.hincrby(KEY, f"{node_type}:{status}:count", count)
+            pipe.hincrbyfloat(KEY, f"{node_type}:{status}:duration_ms", pending_ms.get((node_type, status), 0.0))
+        pipe.execute()
+    except Exception as error:
+        # counters are best effort; this batch only stays in the local snapshot
+        logger.warning(f"Could not publish step metrics: {error}")
+
+def snapshot() -> Dict[str, Dict[str, float]]:
+    with _lock:
+        return {
+            f"{node_type}:{status}": {"count": count, "duration_ms": _duration_ms.get((node_type, status), 0.0)}
+            for (node_type, status), count in _steps.items()
+        }
+
+def shared_snapshot() -> Dict[str, Dict[str, float]]:
+    """Totals across all workers, as of their last flush."""
+    out: Dict[str, Dict[str, float]] = {}
+    for field, value in get_redis().hgetall(KEY).items():
+        name, _, metric = field.decode().rpartition(":")
+        out.setdefault(name, {"count": 0, "duration_ms": 0.0})[metric] = int(value) if metric == "count" else float(value)
+    return out
@@ -1,13 +1,25 @@
 import os
-from datetime import datetime
-from celery import Celery
+import time
+from datetime import datetime, timedelta
+from typing import Any, Iterable, List, Optional, Sequence, Tuple
+from celery import Celery, Task
+from celery.worker.request import Request
 from loguru import logger
+from sqlalchemy import inspect as sa_inspect, update
 from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
 
 from ..db import SessionLocal
-from ..models import Execution, Step, StepStatus, ExecutionStatus
-from .graph import next_nodes, find_node
-from .registry import registry, Services, HandlerResult
+from ..kv import REDIS_URL
+from ..models import Execution, Step, StepStatus, ExecutionStatus, Workflow, WorkflowVersion, PersistenceLevel
+from .graph import CompiledGraph, graph_cache
+from .registry import registry, Services, HandlerResult, DeferNode
+from .counters import arrivals
+from .http_client import http_client
+from . import cancellation, metrics, steplog, timers
+from .retry import retry_delay_ms
+from .timeouts import time_limit
+from .steplog import STEP_SINK
 from ..utils import gen_id
 
 # register built-in handlers
@@ -15,110 +27,385 @@ from .handlers.send_notification import handler as send_notification_handler
 from .handlers.delay import handler as delay_handler
 from .handlers.http_call import handler as http_call_handler
 from .handlers.branch import handler as branch_handler
+from .handlers.join import handler as join_handler
 
 registry.register(send_notification_handler)
 registry.register(delay_handler)
 registry.register(http_call_handler)
 registry.register(branch_handler)
+registry.register(join_handler)
 
-REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 celery_app = Celery("engine", broker=REDIS_URL, backend=REDIS_URL)
+# hard backstop: a task stuck past this is killed and its worker process replaced
+celery_app.conf.task_time_limit = int(os.getenv("TASK_HARD_TIME_LIMIT", "300"))
 
-def _db() -> Session:
-    return SessionLocal()
+# default per-node timeout when a node has no data.timeout_ms (0 = none)
+NODE_TIMEOUT_MS = float(os.getenv("NODE_TIMEOUT_MS", "0"))
 
-def _mark_exec_started(db: Session, execution_obj: Execution) -> None:
+# how long a node may keep being deferred (e.g. its host's circuit is open) before it fails
+NODE_MAX_DEFER_MS = float(os.getenv("NODE_MAX_DEFER_MS", "600000"))
+
+# budget for running successive cheap nodes inline within one task
+INLINE_MAX_STEPS = int(os.getenv("INLINE_MAX_STEPS", "20"))
+INLINE_MAX_MS = float(os.getenv("INLINE_MAX_MS", "200"))
+
+# "immediate": insert a RUNNING step, then update it when done (commit per transition)
+# "coalesced": write each step once when it finishes, committed with the rest of the task
+STEP_WRITE_MODE = os.getenv("STEP_WRITE_MODE", "immediate")
+
+def enqueue_many(items: Iterable[Sequence[Any]]) -> None:
+    # publish execute_node args (execution_id, node_id[, resume_from_id]) over one pooled producer connection
+    with celery_app.producer_or_acquire() as producer:
+        for args in items:
+            execute_node.apply_async(args=list(args), producer=producer)
+
+def worker_session() -> Session:
+    # objects stay usable across commits instead of being re-selected after each one
+    return SessionLocal(expire_on_commit=False)
+
+def _mark_exec_started(db: Session, execution_obj: Execution, graph: CompiledGraph) -> None:
     if execution_obj.status == ExecutionStatus.PENDING:
-        execution_obj.status = ExecutionStatus.RUNNING
-        execution_obj.started_at = datetime.utcnow()
-        db.commit()
+        now = datetime.utcnow()
+        # set in memory without dirtying the object: the row is only changed by the
+        # guarded UPDATE in _flush_started, so a cancel or deadline that lands before
+        # it is never written back to RUNNING
+        set_committed_value(execution_obj, "status", ExecutionStatus.RUNNING)
+        set_committed_value(execution_obj, "started_at", now)
+        db.info["started_at"] = now
+        if STEP_WRITE_MODE == "immediate":
+            _flush_started(db, execution_obj.id)
+            db.commit()
+        deadline = _deadline(execution_obj, graph)
+        if deadline:
+            # fires even if every branch is parked on a long delay
+            timers.schedule(max(0.0, (deadline - datetime.utcnow()).total_seconds() * 1000), execution_obj.id, "__DEADLINE__")
+
+def _flush_started(db: Session, execution_id: str) -> None:
+    started_at = db.info.pop("started_at", None)
+    if started_at:
+        db.execute(
+            update(Execution)
+            .where(Execution.id == execution_id, Execution.status == ExecutionStatus.PENDING)
+            .values(status=ExecutionStatus.RUNNING, started_at=started_at)
+            .execution_options(synchronize_session=False)
+        )
+
+def _deadline(execution_obj: Execution, graph: CompiledGraph) -> Optional[datetime]:
+    if not graph.timeout_ms:
+        return None
+    return (execution_obj.created_at or datetime.utcnow()) + timedelta(milliseconds=graph.timeout_ms)
 
-@celery_app.task(name="execute_node")
-def execute_node(execution_id: str, node_id: str, resume_from_id: str | None = None) -> None:
-    db = _db()
+def _fail_execution(db: Session, execution_id: str, reason: str) -> None:
+    db.flush()
+    _flush_started(db, execution_id)
+    db.execute(
+        update(Execution)
+        .where(Execution.id == execution_id, Execution.status.in_([ExecutionStatus.PENDING, ExecutionStatus.RUNNING]))
+        .values(status=ExecutionStatus.FAILED, finished_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    logger.warning(f"Execution {execution_id} failed: {reason}")
+
+def _load(db: Session, execution_id: str) -> Optional[Tuple[Execution, CompiledGraph]]:
     exec_obj = db.query(Execution).filter(Execution.id == execution_id).first()
     if not exec_obj:
+        return None
+    version = exec_obj.workflow_version
+    if version is None:
+        # executions created before versions were pinned follow the live workflow
+        version = db.query(Workflow.version).filter(Workflow.id == exec_obj.workflow_id).scalar()
+    # snapshots are immutable, so a cached graph never goes stale
+    graph = graph_cache.get_or_load((exec_obj.workflow_id, version), lambda: _load_definition(db, exec_obj.workflow_id, version))
+    return exec_obj, graph
+
+def _load_definition(db: Session, workflow_id: str, version: int) -> Tuple[dict, Optional[str]]:
+    row = (
+        db.query(WorkflowVersion.definition, WorkflowVersion.persistence)
+        .filter(WorkflowVersion.workflow_id == workflow_id, WorkflowVersion.version == version)
+        .first()
+    )
+    if row is None:
+        row = db.query(Workflow.definition, Workflow.persistence).filter(Workflow.id == workflow_id).first()
+    if row is None:
+        return {}, None
+    definition, persistence = row
+    return definition or {}, persistence
+
+class NodeRequest(Request):
+    def on_timeout(self, soft: bool, timeout: float) -> None:
+        super().on_timeout(soft, timeout)
+        if not soft:
+            # the child process was killed mid-task and the message is already acked:
+            # fail the execution from a fresh task so it does not stay RUNNING
+            execute_node.apply_async(args=[self.args[0], "__TIME_LIMIT__"])
+
+class NodeTask(Task):
+    Request = NodeRequest
+
+@celery_app.task(name="execute_node", base=NodeTask)
+def execute_node(execution_id: str, node_id: str, resume_from_id: str | None = None, attempt: int = 0, deferred_since: float | None = None) -> None:
+    db = worker_session()
+    try:
+        started = start_task(db, execution_id, node_id, resume_from_id)
+        if started:
+            exec_obj, graph, node_id = started
+            _run_chain(db, exec_obj, graph, node_id, attempt, deferred_since)
+        end_task(db, execution_id)
+    finally:
+        db.close()
+
+def start_task(db: Session, execution_id: str, node_id: str, resume_from_id: str | None) -> Optional[Tuple[Execution, CompiledGraph, str]]:
+    """Load the execution for a task and the node to run first; None when there is none."""
+    loaded = _load(db, execution_id)
+    if not loaded:
         logger.error(f"Execution {execution_id} not found")
-        return
+        return None
+    exec_obj, graph = loaded
+
+    if exec_obj.status not in (ExecutionStatus.PENDING, ExecutionStatus.RUNNING):
+        # finished, failed (e.g. deadline) or cancelled: drop outstanding work
+        return None
+
+    if node_id == "__DEADLINE__":
+        _fail_execution(db, execution_id, "execution deadline exceeded")
+        return None
 
-    wf = exec_obj.workflow
-    graph = wf.definition
+    if node_id == "__TIME_LIMIT__":
+        _fail_execution(db, execution_id, "worker task hit the hard time limit")
+        return None
 
-    _mark_exec_started(db, exec_obj)
+    _mark_exec_started(db, exec_obj, graph)
 
     # special resume path (used by delay): compute next from resume_from_id
     if node_id == "__RESUME_AFTER__" and resume_from_id:
-        next_node_ids = next_nodes(resume_from_id, graph)
-        if not next_node_ids:
-            _maybe_finish_execution(db, exec_obj)
+        # a single cheap successor comes back to run in this task; anything else is enqueued
+        node_id = advance(db, exec_obj, graph, graph.next_nodes(resume_from_id), INLINE_MAX_STEPS, time.monotonic())
+        if node_id is None:
+            return None
+    return exec_obj, graph, node_id
+
+def end_task(db: Session, execution_id: str) -> None:
+    # flush anything the coalesced mode or summary counters left pending
+    _flush_counters(db, execution_id)
+    db.commit()
+    steplog.flush(db)
+
+def _can_inline(graph: CompiledGraph, node_id: str) -> bool:
+    node = graph.find_node(node_id)
+    if not node:
+        return True
+    try:
+        return getattr(registry.get(node.get("type")), "inline", False)
+    except KeyError:
+        return False
+
+def advance(db: Session, exec_obj: Execution, graph: CompiledGraph, next_node_ids: List[str], budget: int, started: float) -> Optional[str]:
+    """Return the next node to run inline, enqueueing anything else."""
+    if not next_node_ids:
+        _maybe_finish_execution(db, exec_obj)
+        return None
+    within_budget = budget > 0 and (time.monotonic() - started) * 1000 < INLINE_MAX_MS
+    if len(next_node_ids) == 1 and within_budget and _can_inline(graph, next_node_ids[0]):
+        return next_node_ids[0]
+    # fan-out, slow node or spent budget: hop through the broker
+    if len(next_node_ids) > 1:
+        # count the new branches before any of them can finish
+        _add_tokens(db, exec_obj.id, len(next_node_ids) - 1)
+        db.commit()
+    for next_id in next_node_ids:
+        execute_node.delay(exec_obj.id, next_id)
+    return None
+
+def _run_chain(db: Session, exec_obj: Execution, graph: CompiledGraph, node_id: str, attempt: int = 0, deferred_since: float | None = None) -> None:
+    # keep running cheap successors in this task instead of one broker hop per node
+    started = time.monotonic()
+    budget = INLINE_MAX_STEPS
+    current: Optional[str] = node_id
+    while current:
+        next_node_ids = _run_node(db, exec_obj, graph, current, attempt, deferred_since)
+        if next_node_ids is None:
             return
-        for next_id in next_node_ids:
-            execute_node.delay(execution_id, next_id)
-        return
+        attempt, deferred_since = 0, None
+        budget -= 1
+        current = advance(db, exec_obj, graph, next_node_ids, budget, started)
+
+class NodeRun:
+    """A node invocation between begin_node and finish_node/fail_node."""
+
+    def __init__(self, node_id: str, node: dict, data: dict, step: Step, persist: bool, attempt: int, services: Services, deferred_since: float | None = None) -> None:
+        self.node_id = node_id
+        self.type = node.get("type")
+        self.data = data
+        self.step = step
+        self.persist = persist
+        self.attempt = attempt
+        # epoch ms of the first deferral of this attempt, carried through the timer
+        self.deferred_since = deferred_since
+        self.services = services
+        self.started = time.monotonic()
+        self.timeout_ms = self.data.get("timeout_ms") or NODE_TIMEOUT_MS
+
+    def kwargs(self, exec_obj: Execution) -> dict:
+        return dict(node_id=self.node_id, data=self.data, exec_id=exec_obj.id, payload=exec_obj.context or {}, services=self.services)
+
+def _run_node(db: Session, exec_obj: Execution, graph: CompiledGraph, node_id: str, attempt: int = 0, deferred_since: float | None = None) -> Optional[List[str]]:
+    """Execute one node; return its successors, or None when the branch is parked or failed."""
+    run = begin_node(db, exec_obj, graph, node_id, attempt, deferred_since)
+    if not isinstance(run, NodeRun):
+        return run
+    try:
+        handler = registry.get(run.type)
+        with time_limit(run.timeout_ms):
+            result: HandlerResult = handler.execute(**run.kwargs(exec_obj))
+    except Exception as error:
+        return fail_node(db, exec_obj, graph, run, error)
+    return finish_node(db, exec_obj, graph, run, result)
 
-    node = find_node(node_id, graph)
+def begin_node(db: Session, exec_obj: Execution, graph: CompiledGraph, node_id: str, attempt: int, deferred_since: float | None = None) -> NodeRun | Optional[List[str]]:
+    """Create the step for a node, or return the branch outcome if it must not run."""
+    execution_id = exec_obj.id
+    node = graph.find_node(node_id)
     if not node:
         logger.warning(f"Node {node_id} not found; finishing if no more work")
-        _maybe_finish_execution(db, exec_obj)
-        return
+        return []
+
+    if cancellation.is_cancelled(execution_id):
+        logger.info(f"Execution {execution_id} cancelled; skipping node {node_id}")
+        return None
+
+    deadline = _deadline(exec_obj, graph)
+    if deadline and datetime.utcnow() >= deadline:
+        _fail_execution(db, execution_id, "execution deadline exceeded")
+        return None
 
-    # create step
+    # create step; below "full" persistence only failed steps are stored
+    persist = graph.persistence == PersistenceLevel.FULL
     step = Step(
         id=gen_id(),
         execution_id=execution_id,
         node_id=node_id,
         type=node.get("type", "unknown"),
         status=StepStatus.RUNNING,
+        attempt=attempt,
         started_at=datetime.utcnow(),
     )
-    db.add(step)
-    db.commit()
-    db.refresh(step)
+    if persist and STEP_SINK == "db":
+        db.add(step)
+        if STEP_WRITE_MODE == "immediate":
+            db.commit()
+    data = graph.node_data(node_id, {"payload": exec_obj.context or {}, "exec_id": execution_id, "node_id": node_id})
+    return NodeRun(node_id, node, data, step, persist, attempt, Services(graph=graph, arrivals=arrivals, http=http_client), deferred_since)
 
-    try:
-        handler = registry.get(node.get("type"))
-        result: HandlerResult = handler.execute(
-            node_id=node_id,
-            data=node.get("data") or {},
-            exec_id=execution_id,
-            payload=exec_obj.context or {},
-            services=Services(),
-        )
-        step.status = StepStatus.SUCCEEDED
-        step.finished_at = datetime.utcnow()
-        step.output = result.result or {}
+def finish_node(db: Session, exec_obj: Execution, graph: CompiledGraph, run: NodeRun, result: HandlerResult) -> Optional[List[str]]:
+    step = run.step
+    step.status = StepStatus.SUCCEEDED
+    step.finished_at = datetime.utcnow()
+    step.output = result.result or {}
+    _record(db, graph, step, run.started)
+    if run.persist and STEP_SINK == "stream":
+        steplog.buffer(db, step)
+    elif run.persist and STEP_WRITE_MODE == "immediate":
         db.commit()
 
-        if result.halted:
-            # e.g., delay scheduled the resume task
-            return
+    if result.halted:
+        # e.g., delay scheduled the resume task
+        return None
 
-        # if handler selected a next, honor it (branch)
-        if result.selected_next:
-            execute_node.delay(execution_id, result.selected_next)
-            return
+    if result.stop:
+        # e.g., join still waiting for other branches: release this one
+        return []
 
-        # else follow graph edges
-        next_node_ids = next_nodes(node_id, graph)
-        if not next_node_ids:
-            _maybe_finish_execution(db, exec_obj)
-            return
-        # fan-out: enqueue all next nodes
-        for next_id in next_node_ids:
-            execute_node.delay(execution_id, next_id)
+    # if handler selected a next, honor it (branch)
+    if result.selected_next:
+        return [result.selected_next]
 
-    except Exception as error:
-        step.status = StepStatus.FAILED
-        step.finished_at = datetime.utcnow()
-        step.error = {"message": str(error)}
-        exec_obj.status = ExecutionStatus.FAILED
-        exec_obj.finished_at = datetime.utcnow()
+    # else follow graph edges
+    return graph.next_nodes(run.node_id)
+
+def fail_node(db: Session, exec_obj: Execution, graph: CompiledGraph, run: NodeRun, error: Exception) -> None:
+    if isinstance(error, DeferNode):
+        since = run.deferred_since or time.time() * 1000
+        if time.time() * 1000 + error.delay_ms - since <= NODE_MAX_DEFER_MS:
+            return _defer_node(db, exec_obj, run, error, since)
+        # deferred for too long: fail through the retry policy with the underlying error
+        error = error.__cause__ or error
+    step, attempt = run.step, run.attempt
+    step.status = StepStatus.FAILED
+    step.finished_at = datetime.utcnow()
+    step.error = {"message": str(error), "type": type(error).__name__}
+    delay_ms = retry_delay_ms(run.data.get("retry"), attempt, error)
+    if delay_ms is not None:
+        step.error["retry_in_ms"] = round(delay_ms)
+        attempt += 1
+    _record(db, graph, step, run.started)
+    if STEP_SINK == "stream":
+        steplog.buffer(db, step)
+    else:
+        db.add(step)
+    if delay_ms is not None:
+        # the branch keeps its token while parked on the retry timer
         db.commit()
-        logger.exception(error)
+        timers.schedule(delay_ms, exec_obj.id, run.node_id, None, attempt)
+        logger.warning(f"Node {run.node_id} of execution {exec_obj.id} rescheduled in {delay_ms:.0f}ms: {error}")
+        return None
+    # guarded, so an execution cancelled while the node ran stays CANCELLED
+    _fail_execution(db, exec_obj.id, f"node {run.node_id} failed")
+    logger.opt(exception=error).error(f"Node {run.node_id} of execution {exec_obj.id} failed")
+    return None
+
+def _defer_node(db: Session, exec_obj: Execution, run: NodeRun, error: DeferNode, since: float) -> None:
+    # a deferral is not a failure: drop the step instead of recording it FAILED
+    state = sa_inspect(run.step)
+    if state.pending:
+        db.expunge(run.step)
+    elif state.persistent:
+        db.delete(run.step)
+    metrics.record_step(run.step.type, "DEFERRED", (time.monotonic() - run.started) * 1000)
+    # the branch keeps its token while parked on the timer
+    db.commit()
+    timers.schedule(error.delay_ms, exec_obj.id, run.node_id, None, run.attempt, since)
+    logger.info(f"Node {run.node_id} of execution {exec_obj.id} deferred {error.delay_ms:.0f}ms: {error}")
+    return None
+
+def _record(db: Session, graph: CompiledGraph, step: Step, started: float) -> None:
+    metrics.record_step(step.type, step.status.value, (time.monotonic() - started) * 1000)
+    if graph.persistence == PersistenceLevel.SUMMARY:
+        # tallied per task and applied in one UPDATE by _flush_counters
+        field = "steps_failed" if step.status == StepStatus.FAILED else "steps_succeeded"
+        db.info[field] = db.info.get(field, 0) + 1
+
+def _flush_counters(db: Session, execution_id: str) -> None:
+    _flush_started(db, execution_id)
+    counts = {f: db.info.pop(f) for f in ("steps_succeeded", "steps_failed") if f in db.info}
+    if counts:
+        db.execute(
+            update(Execution)
+            .where(Execution.id == execution_id)
+            .values(**{f: getattr(Execution, f) + n for f, n in counts.items()})
+            .execution_options(synchronize_session=False)
+        )
+
+def _add_tokens(db: Session, execution_id: str, delta: int) -> int:
+    # write pending ORM changes (coalesced steps, RUNNING status) before the UPDATE
+    db.flush()
+    _flush_started(db, execution_id)
+    stmt = (
+        update(Execution)
+        .where(Execution.id == execution_id)
+        .values(tokens=Execution.tokens + delta)
+        .returning(Execution.tokens)
+        .execution_options(synchronize_session=False)
+    )
+    return db.execute(stmt).scalar_one()
 
 def _maybe_finish_execution(db: Session, exec_obj: Execution) -> None:
-    # finish if all steps have succeeded or none pending/running
-    if exec_obj.status not in (ExecutionStatus.FAILED, ExecutionStatus.CANCELLED):
-        exec_obj.status = ExecutionStatus.SUCCEEDED
-        exec_obj.finished_at = datetime.utcnow()
-        db.commit()
\ No newline at end of file
+    # a branch ended; only the one that releases the last token finishes the execution
+    if _add_tokens(db, exec_obj.id, -1) <= 0:
+        db.execute(
+            update(Execution)
+            .where(Execution.id == exec_obj.id, Execution.status.notin_([ExecutionStatus.FAILED, ExecutionStatus.CANCELLED]))
+            .values(status=ExecutionStatus.SUCCEEDED, finished_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
@@ -0,0 +1,67 @@
+import argparse
+import os
+import time
+from typing import Any, Iterable, Sequence
+
+from loguru import logger
+from sqlalchemy import delete, insert
+from sqlalchemy.orm import Session
+
+from ..db import SessionLocal
+from ..models import OutboxMessage
+from .orchestrator import enqueue_many
+
+# "direct": publish right after commit; "outbox": write outbox rows in the same
+# transaction and let the relay publish them in batches
+ENQUEUE_MODE = os.getenv("ENQUEUE_MODE", "direct")
+
+def commit_and_enqueue(db: Session, items: Iterable[Sequence[Any]]) -> None:
+    items = [list(args) for args in items]
+    if ENQUEUE_MODE == "outbox":
+        if items:
+            db.execute(insert(OutboxMessage), [{"args": args} for args in items])
+        db.commit()
+        return
+    db.commit()
+    if items:
+        enqueue_many(items)
+
+def relay_once(batch_size: int = 1000) -> int:
+    db = SessionLocal()
+    try:
+        # SKIP LOCKED lets several relays drain the table without double-publishing
+        rows = (
+            db.query(OutboxMessage)
+            .order_by(OutboxMessage.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not rows:
+            return 0
+        enqueue_many(row.args for row in rows)
+        db.execute(delete(OutboxMessage).where(OutboxMessage.id.in_([row.id for row in rows])))
+        db.commit()
+        return len(rows)
+    finally:
+        db.close()
+
+def run_relay(interval: float = 0.1, batch_size: int = 1000) -> None:
+    while True:
+        try:
+            published = relay_once(batch_size)
+        except Exception as error:
+            logger.exception(error)
+            published = 0
+        if published < batch_size:
+            time.sleep(interval)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Publish outbox rows to the broker")
+    parser.add_argument("--interval", type=float, default=0.1)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    run_relay(args.interval, args.batch_size)
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,15 @@
+import inspect
 from typing import Protocol, Any, Optional, Dict
 from pydantic import BaseModel
 
 class Services(BaseModel):
     # placeholder for DI: http client, db, logger, etc.
-    pass
+    # compiled graph of the workflow version being executed
+    graph: Any = None
+    # atomic per-execution arrival counters (used by join)
+    arrivals: Any = None
+    # pooled keep-alive HTTP client shared by the worker process
+    http: Any = None
 
 class HandlerResult(BaseModel):
     result: Optional[dict] = None
@@ -11,11 +17,29 @@ class HandlerResult(BaseModel):
     selected_next: Optional[str] = None
     # when True, orchestrator should stop after this node (e.g., delay scheduled resume)
     halted: bool = False
+    # when True, this path ends here without following edges (e.g., join still waiting)
+    stop: bool = False
+
+class DeferNode(Exception):
+    """Raised by a handler to re-run the node later without using a retry attempt."""
+
+    def __init__(self, delay_ms: float, reason: str = "") -> None:
+        super().__init__(reason)
+        self.delay_ms = delay_ms
 
 class NodeHandler(Protocol):
     type: str
     def execute(self, *, node_id: str, data: dict, exec_id: str, payload: dict | None, services: Services) -> HandlerResult: ...
 
+class AsyncNodeHandler(Protocol):
+    # handlers may also provide a coroutine; the asyncio runtime awaits it
+    # instead of running execute() in its thread pool
+    type: str
+    async def execute_async(self, *, node_id: str, data: dict, exec_id: str, payload: dict | None, services: Services) -> HandlerResult: ...
+
+def is_async(handler: Any) -> bool:
+    return inspect.iscoroutinefunction(getattr(handler, "execute_async", None))
+
 class NodeRegistry:
     def __init__(self) -> None:
         self._handlers: dict[str, NodeHandler] = {}
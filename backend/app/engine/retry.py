@@ -0,0 +1,25 @@
+import random
+from typing import Optional
+
+# Node retry policy, read from a node's data.retry:
+#   {"max_attempts": 3, "backoff_ms": 1000, "backoff_max_ms": 60000,
+#    "jitter": true, "retry_on": ["ConnectionError", "Timeout"]}
+# retry_on matches exception class names (including base classes); when it is
+# omitted every error is retried.
+
+def retry_delay_ms(policy: Optional[dict], attempt: int, error: Exception) -> Optional[float]:
+    """Backoff before the next attempt, or None when the failure is final."""
+    if not policy:
+        return None
+    if attempt + 1 >= int(policy.get("max_attempts", 1)):
+        return None
+    retry_on = policy.get("retry_on")
+    if retry_on and not any(cls.__name__ in retry_on for cls in type(error).__mro__):
+        return None
+    base = float(policy.get("backoff_ms", 1000))
+    cap = float(policy.get("backoff_max_ms", 60000))
+    delay = min(cap, base * 2 ** attempt)
+    if policy.get("jitter", True):
+        # equal jitter: keep half the backoff, randomise the rest
+        delay = delay / 2 + random.uniform(0, delay / 2)
+    return delay
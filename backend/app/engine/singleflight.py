@@ -0,0 +1,165 @@
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from loguru import logger
+
+from ..kv import get_redis
+
+# Single-flight: concurrent calls with the same key share one execution of the
+# work instead of each running it. Within a process, followers wait on the
+# leader (threads) or on its future (asyncio). Across processes, the leader
+# holds a short Redis lock and publishes its encoded result for followers to
+# poll; if it fails or the wait runs out, followers do the work themselves.
+LOCK_MS = int(os.getenv("SINGLEFLIGHT_LOCK_MS", "10000"))
+RESULT_TTL_MS = int(os.getenv("SINGLEFLIGHT_RESULT_TTL_MS", "1000"))
+POLL_MS = int(os.getenv("SINGLEFLIGHT_POLL_MS", "20"))
+# how long a follower in another worker waits for the leader's result
+WAIT_MS = int(os.getenv("SINGLEFLIGHT_WAIT_MS", "5000"))
+KEY_PREFIX = "singleflight:"
+
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+class SingleFlight:
+    def __init__(self) -> None:
+        self._calls: Dict[str, _Call] = {}
+        self._futures: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+        try:
+            call.value = fn()
+            return call.value
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def do_async(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        # futures belong to one event loop; the asyncio runtime runs a single loop
+        while key in self._futures:
+            future = self._futures[key]
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # the leader was cancelled (e.g. its node timed out): take over
+        future = asyncio.get_running_loop().create_future()
+        self._futures[key] = future
+        try:
+            value = await fn()
+        except Exception as error:
+            future.set_exception(error)
+            # mark retrieved so a leader without followers does not log "never retrieved"
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            self._futures.pop(key, None)
+
+flights = SingleFlight()
+
+def _lead(key: str) -> Optional[bool]:
+    try:
+        return bool(get_redis().set(KEY_PREFIX + key, 1, nx=True, px=LOCK_MS))
+    except Exception as error:
+        logger.warning(f"Single-flight lock unavailable: {error}")
+        return None
+
+def _publish(key: str, encoded: str) -> None:
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        # result first: a follower that sees the lock gone is sure to see the result
+        pipe.set(f"{KEY_PREFIX}{key}:result", encoded, px=RESULT_TTL_MS)
+        pipe.delete(KEY_PREFIX + key)
+        pipe.execute()
+    except Exception as error:
+        logger.warning(f"Single-flight publish failed: {error}")
+
+def _unlock(key: str) -> None:
+    try:
+        get_redis().delete(KEY_PREFIX + key)
+    except Exception as error:
+        logger.warning(f"Single-flight unlock failed: {error}")
+
+def _poll(key: str) -> tuple:
+    """(still locked, encoded result or None)."""
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.exists(KEY_PREFIX + key)
+        pipe.get(f"{KEY_PREFIX}{key}:result")
+        locked, raw = pipe.execute()
+    except Exception as error:
+        logger.warning(f"Single-flight poll failed: {error}")
+        return False, None
+    return bool(locked), raw
+
+def shared_do(key: str, fn: Callable[[], Any], encode: Callable[[Any], str], decode: Callable[[bytes], Any], wait_ms: float) -> Any:
+    """Run fn once across workers for key, or reuse the result another worker publishes."""
+    leader = _lead(key)
+    if leader is None:
+        return fn()
+    if leader:
+        try:
+            value = fn()
+        except BaseException:
+            _unlock(key)
+            raise
+        _publish(key, encode(value))
+        return value
+    deadline = time.monotonic() + wait_ms / 1000
+    while time.monotonic() < deadline:
+        locked, raw = _poll(key)
+        if raw is not None:
+            return decode(raw)
+        if not locked:
+            break
+        time.sleep(POLL_MS / 1000)
+    return fn()
+
+async def shared_do_async(key: str, fn: Callable[[], Awaitable[Any]], encode: Callable[[Any], str], decode: Callable[[bytes], Any], wait_ms: float) -> Any:
+    leader = await asyncio.to_thread(_lead, key)
+    if leader is None:
+        return await fn()
+    if leader:
+        try:
+            value = await fn()
+        except BaseException:
+            await asyncio.to_thread(_unlock, key)
+            raise
+        await asyncio.to_thread(_publish, key, encode(value))
+        return value
+    deadline = time.monotonic() + wait_ms / 1000
+    while time.monotonic() < deadline:
+        locked, raw = await asyncio.to_thread(_poll, key)
+        if raw is not None:
+            return decode(raw)
+        if not locked:
+            break
+        await asyncio.sleep(POLL_MS / 1000)
+    return await fn()
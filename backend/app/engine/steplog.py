@@ -0,0 +1,115 @@
+import argparse
+import json
+import os
+import socket
+from datetime import datetime
+from typing import Any, Dict, List
+
+from loguru import logger
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from ..db import SessionLocal
+from ..kv import get_redis
+from ..models import Step
+
+# "db": workers write Step rows themselves; "stream": workers append finished
+# steps to a Redis Stream and a flusher bulk-inserts them into Postgres
+STEP_SINK = os.getenv("STEP_SINK", "db")
+STREAM = os.getenv("STEP_STREAM", "steps:log")
+GROUP = "flushers"
+CLAIM_IDLE_MS = int(os.getenv("STEP_STREAM_CLAIM_IDLE_MS", "60000"))
+# per-execution index of unflushed steps (step id -> event), read by the API;
+# the TTL only cleans up after entries the flusher dropped
+PENDING_PREFIX = "steps:pending:"
+PENDING_TTL_SECONDS = 24 * 3600
+
+_FIELDS = ("id", "execution_id", "node_id", "type", "status", "attempt", "started_at", "finished_at", "input", "output", "error")
+_DATES = ("started_at", "finished_at")
+
+def _encode(step: Step) -> str:
+    record: Dict[str, Any] = {f: getattr(step, f) for f in _FIELDS}
+    record["status"] = getattr(step.status, "value", step.status)
+    record["attempt"] = step.attempt or 0
+    for f in _DATES:
+        record[f] = record[f].isoformat() if record[f] else None
+    return json.dumps(record, default=str)
+
+def _decode(raw: bytes) -> Dict[str, Any]:
+    record = json.loads(raw)
+    for f in _DATES:
+        record[f] = datetime.fromisoformat(record[f]) if record[f] else None
+    return record
+
+def buffer(db: Session, step: Step) -> None:
+    # held on the session until the worker task ends, then appended in one pipeline
+    db.info.setdefault("step_events", []).append((step.execution_id, step.id, _encode(step)))
+
+def flush(db: Session) -> None:
+    events = db.info.pop("step_events", None)
+    if not events:
+        return
+    pipe = get_redis().pipeline(transaction=False)
+    for execution_id, step_id, event in events:
+        pipe.xadd(STREAM, {"step": event})
+        pipe.hset(PENDING_PREFIX + execution_id, step_id, event)
+        pipe.expire(PENDING_PREFIX + execution_id, PENDING_TTL_SECONDS)
+    pipe.execute()
+
+def pending_for(execution_id: str) -> List[Dict[str, Any]]:
+    # entries leave the index once the flusher has stored them
+    return [_decode(raw) for raw in get_redis().hvals(PENDING_PREFIX + execution_id)]
+
+def _ensure_group() -> None:
+    try:
+        get_redis().xgroup_create(STREAM, GROUP, id="0", mkstream=True)
+    except Exception as error:
+        if "BUSYGROUP" not in str(error):
+            raise
+
+def _write(entries: List[Any]) -> None:
+    if not entries:
+        return
+    ids, decoded = [], []
+    for entry_id, fields in entries:
+        ids.append(entry_id)
+        try:
+            decoded.append(_decode(fields[b"step"]))
+        except (KeyError, TypeError, ValueError):
+            logger.warning(f"Dropping malformed step entry {entry_id}")
+    db = SessionLocal()
+    try:
+        # redelivered entries may already be stored
+        existing = set(db.scalars(select(Step.id).where(Step.id.in_([r["id"] for r in decoded]))))
+        rows = [r for r in decoded if r["id"] not in existing]
+        if rows:
+            db.execute(insert(Step), rows)
+            db.commit()
+    finally:
+        db.close()
+    pipe = get_redis().pipeline(transaction=False)
+    for record in decoded:
+        pipe.hdel(PENDING_PREFIX + record["execution_id"], record["id"])
+    pipe.xack(STREAM, GROUP, *ids)
+    pipe.xdel(STREAM, *ids)
+    pipe.execute()
+
+def run_flusher(consumer: str, batch_size: int = 1000, block_ms: int = 1000) -> None:
+    r = get_redis()
+    _ensure_group()
+    while True:
+        try:
+            _write(r.xautoclaim(STREAM, GROUP, consumer, CLAIM_IDLE_MS, count=batch_size)[1])
+            for _, entries in r.xreadgroup(GROUP, consumer, {STREAM: ">"}, count=batch_size, block=block_ms) or []:
+                _write(entries)
+        except Exception as error:
+            logger.exception(error)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk-insert streamed step events into Postgres")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    run_flusher(f"{socket.gethostname()}-{os.getpid()}", args.batch_size)
+
+if __name__ == "__main__":
+    main()
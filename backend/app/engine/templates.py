@@ -0,0 +1,63 @@
+import re
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from .logic import lookup, var_path
+
+# {{ path }} placeholders in node data, compiled once per workflow version.
+# Paths are dotted lookups into the render scope ({"payload": ..., "exec_id": ...}).
+# Placeholders are interpolated with str(), missing values as "", so URLs and
+# headers are always strings. Under the top-level keys in RAW_FIELDS (the JSON
+# body), a string that is exactly one placeholder renders to the raw value
+# instead, so numbers and objects keep their type.
+
+Renderer = Callable[[Dict[str, Any]], Any]
+
+_PLACEHOLDER = re.compile(r"{{\s*([^{}]+?)\s*}}")
+RAW_FIELDS = ("body",)
+
+def _compile_string(text: str, raw: bool) -> Optional[Renderer]:
+    parts: List[Union[str, List[str]]] = []
+    pos = 0
+    for match in _PLACEHOLDER.finditer(text):
+        if match.start() > pos:
+            parts.append(text[pos:match.start()])
+        parts.append(var_path(match.group(1)))
+        pos = match.end()
+    if not pos:
+        return None
+    if pos < len(text):
+        parts.append(text[pos:])
+    if raw and len(parts) == 1:
+        path = parts[0]
+        return lambda scope: lookup(scope, path)
+
+    def interpolate(scope: Dict[str, Any]) -> str:
+        out = []
+        for part in parts:
+            if isinstance(part, str):
+                out.append(part)
+            else:
+                value = lookup(scope, part)
+                out.append("" if value is None else str(value))
+        return "".join(out)
+    return interpolate
+
+def compile_template(value: Any, raw: bool = False, raw_fields: tuple = ()) -> Optional[Renderer]:
+    """Compile placeholders in a string, dict or list; None when there are none.
+
+    raw keeps single-placeholder values typed; raw_fields turns it on for those
+    keys of a top-level dict only.
+    """
+    if isinstance(value, str):
+        return _compile_string(value, raw)
+    if isinstance(value, dict):
+        fields = [(k, compile_template(v, raw or k in raw_fields), v) for k, v in value.items()]
+        if not any(fn for _, fn, _ in fields):
+            return None
+        return lambda scope: {k: fn(scope) if fn else v for k, fn, v in fields}
+    if isinstance(value, list):
+        items = [(compile_template(v, raw), v) for v in value]
+        if not any(fn for fn, _ in items):
+            return None
+        return lambda scope: [fn(scope) if fn else v for fn, v in items]
+    return None
@@ -0,0 +1,29 @@
+import signal
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+class NodeTimeout(Exception):
+    pass
+
+@contextmanager
+def time_limit(ms: Optional[float]) -> Iterator[None]:
+    """Raise NodeTimeout in the running handler once ms have elapsed.
+
+    Uses SIGALRM, so it is only enforced on the main thread (the Celery
+    prefork child); elsewhere the Celery hard time limit is the backstop.
+    """
+    if not ms or threading.current_thread() is not threading.main_thread() or not hasattr(signal, "setitimer"):
+        yield
+        return
+
+    def _expire(signum, frame):
+        raise NodeTimeout(f"node exceeded its {ms:.0f}ms timeout")
+
+    previous = signal.signal(signal.SIGALRM, _expire)
+    signal.setitimer(signal.ITIMER_REAL, ms / 1000)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
@@ -0,0 +1,80 @@
+import argparse
+import json
+import time
+from typing import Any, List
+
+from loguru import logger
+
+from ..kv import get_redis
+from ..utils import gen_id
+from .cancellation import cancelled_among
+
+# Durable timers: pending task invocations live in a Redis sorted set scored
+# by due time (epoch ms). Pollers move due entries to an in-flight set with a
+# lease, enqueue them, then drop them; expired leases are fired again.
+DUE_KEY = "timers:due"
+INFLIGHT_KEY = "timers:inflight"
+LEASE_MS = 60_000
+
+_CLAIM = """
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, member in ipairs(due) do
+    redis.call('ZREM', KEYS[1], member)
+    redis.call('ZADD', KEYS[2], ARGV[3], member)
+end
+return due
+"""
+
+_claim_script = None
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+def schedule(delay_ms: float, *args: Any) -> str:
+    """Run execute_node(*args) once delay_ms has elapsed."""
+    timer_id = gen_id()
+    member = json.dumps({"id": timer_id, "args": list(args)})
+    get_redis().zadd(DUE_KEY, {member: _now_ms() + int(delay_ms)})
+    return timer_id
+
+def _claim(source: str, limit: int) -> List[bytes]:
+    global _claim_script
+    if _claim_script is None:
+        _claim_script = get_redis().register_script(_CLAIM)
+    now = _now_ms()
+    return _claim_script(keys=[source, INFLIGHT_KEY], args=[now, limit, now + LEASE_MS])
+
+def fire_due(batch_size: int = 1000) -> int:
+    # lazy import to avoid circular dependency (handlers schedule timers)
+    from .orchestrator import enqueue_many
+
+    claimed = _claim(INFLIGHT_KEY, batch_size)
+    claimed += _claim(DUE_KEY, batch_size - len(claimed))
+    if not claimed:
+        return 0
+    timers = [json.loads(member)["args"] for member in claimed]
+    # resumes of cancelled executions are dropped here rather than enqueued
+    cancelled = cancelled_among({args[0] for args in timers})
+    enqueue_many(args for args in timers if args[0] not in cancelled)
+    get_redis().zrem(INFLIGHT_KEY, *claimed)
+    return len(claimed)
+
+def run_poller(interval: float = 0.5, batch_size: int = 1000) -> None:
+    while True:
+        try:
+            fired = fire_due(batch_size)
+        except Exception as error:
+            logger.exception(error)
+            fired = 0
+        if fired < batch_size:
+            time.sleep(interval)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fire due workflow timers")
+    parser.add_argument("--interval", type=float, default=0.5)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    run_poller(args.interval, args.batch_size)
+
+if __name__ == "__main__":
+    main()
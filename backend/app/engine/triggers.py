@@ -0,0 +1,197 @@
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from loguru import logger
+
+from .logic import Evaluator, compile_logic, lookup, var_path
+
+# compiled triggers keyed by workflow id -> (version, evaluator);
+# a version bump from update_workflow forces recompilation
+_compiled: Dict[str, Tuple[int, Evaluator]] = {}
+
+def _never(data: Dict[str, Any]) -> bool:
+    return False
+
+def compile_trigger(trigger: Any) -> Evaluator:
+    # empty or malformed triggers never match (same as the interpreted path)
+    if not trigger:
+        return _never
+    try:
+        return compile_logic(trigger)
+    except Exception as error:
+        logger.warning(f"Invalid trigger {trigger!r}: {error}")
+        return _never
+
+def get_trigger(workflow_id: str, version: int, trigger: Any) -> Evaluator:
+    cached = _compiled.get(workflow_id)
+    if cached and cached[0] == version:
+        return cached[1]
+    fn = compile_trigger(trigger)
+    _compiled[workflow_id] = (version, fn)
+    return fn
+
+def forget(workflow_id: str) -> None:
+    _compiled.pop(workflow_id, None)
+
+def matches(wf, event: Dict[str, Any]) -> bool:
+    try:
+        return bool(get_trigger(wf.id, wf.version, wf.trigger)(event or {}))
+    except Exception:
+        # skip triggers that blow up on this event
+        return False
+
+# --- predicate index ---------------------------------------------------------
+# A predicate is (kind, path, value) where kind is "eq", "lower" or "upper".
+# For each trigger we extract a set of predicates at least one of which must
+# hold whenever the trigger matches; triggers without one are always scanned.
+Predicate = Tuple[str, str, Any]
+
+_FLIP = {">": "<", ">=": "<=", "<": ">", "<=": ">="}
+
+def _var_name(arg: Any) -> Optional[str]:
+    if not isinstance(arg, dict) or len(arg) != 1 or "var" not in arg:
+        return None
+    name = arg["var"]
+    if isinstance(name, list):
+        if len(name) != 1:
+            return None
+        name = name[0]
+    return name if isinstance(name, str) and name else None
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def _predicate(operator: str, args: List[Any]) -> Optional[Predicate]:
+    if len(args) != 2:
+        return None
+    left, right = args
+    name = _var_name(left)
+    if name is None:
+        name, right = _var_name(right), left
+        operator = _FLIP.get(operator, operator)
+    if name is None:
+        return None
+    # string equality: soft "==" compares str(value), so hash on str(value)
+    if operator in ("==", "===") and isinstance(right, str):
+        return ("eq", name, right)
+    if operator in (">", ">=") and _is_number(right):
+        return ("lower", name, float(right))
+    if operator in ("<", "<=") and _is_number(right):
+        return ("upper", name, float(right))
+    return None
+
+def extract_predicates(rule: Any) -> Optional[List[Predicate]]:
+    if not isinstance(rule, dict) or len(rule) != 1:
+        return None
+    operator, args = next(iter(rule.items()))
+    if not isinstance(args, list):
+        args = [args]
+    if operator == "and":
+        # any single conjunct is a necessary condition; prefer equality
+        options = [p for p in (extract_predicates(a) for a in args) if p]
+        if not options:
+            return None
+        return min(options, key=lambda preds: (any(k != "eq" for k, _, _ in preds), len(preds)))
+    if operator == "or":
+        out: List[Predicate] = []
+        for arg in args:
+            preds = extract_predicates(arg)
+            if not preds:
+                return None
+            out.extend(preds)
+        return out or None
+    pred = _predicate(operator, args)
+    return [pred] if pred else None
+
+class TriggerIndex:
+    """Shortlists workflows whose trigger can possibly match an event.
+
+    Not thread-safe: add/remove/sync mutate shared dicts and sets in place.
+    Concurrent readers should be handed an index no writer touches any more;
+    writers build the next one from copy() and swap the reference.
+    """
+
+    def __init__(self) -> None:
+        self._versions: Dict[str, int] = {}
+        self._preds: Dict[str, List[Predicate]] = {}
+        self._scan: Set[str] = set()
+        self._eq: Dict[str, Dict[str, Set[str]]] = {}
+        self._lower: Dict[str, List[Tuple[float, str]]] = {}
+        self._upper: Dict[str, List[Tuple[float, str]]] = {}
+        self._paths: Dict[str, List[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._versions)
+
+    def copy(self) -> "TriggerIndex":
+        other = TriggerIndex()
+        other._versions = dict(self._versions)
+        other._preds = dict(self._preds)
+        other._scan = set(self._scan)
+        other._eq = {path: {value: set(ids) for value, ids in buckets.items()} for path, buckets in self._eq.items()}
+        other._lower = {path: list(entries) for path, entries in self._lower.items()}
+        other._upper = {path: list(entries) for path, entries in self._upper.items()}
+        other._paths = dict(self._paths)
+        return other
+
+    def add(self, workflow_id: str, version: int, trigger: Any) -> None:
+        if self._versions.get(workflow_id) == version:
+            return
+        self.remove(workflow_id)
+        self._versions[workflow_id] = version
+        preds = extract_predicates(trigger) if trigger else None
+        if not preds:
+            self._scan.add(workflow_id)
+            return
+        self._preds[workflow_id] = preds
+        for kind, path, value in preds:
+            if path not in self._paths:
+                self._paths[path] = var_path(path)
+            if kind == "eq":
+                self._eq.setdefault(path, {}).setdefault(value, set()).add(workflow_id)
+            elif kind == "lower":
+                insort(self._lower.setdefault(path, []), (value, workflow_id))
+            else:
+                insort(self._upper.setdefault(path, []), (value, workflow_id))
+
+    def remove(self, workflow_id: str) -> None:
+        if self._versions.pop(workflow_id, None) is None:
+            return
+        self._scan.discard(workflow_id)
+        for kind, path, value in self._preds.pop(workflow_id, []):
+            if kind == "eq":
+                bucket = self._eq[path][value]
+                bucket.discard(workflow_id)
+                if not bucket:
+                    del self._eq[path][value]
+            else:
+                entries = (self._lower if kind == "lower" else self._upper)[path]
+                i = bisect_left(entries, (value, workflow_id))
+                if i < len(entries) and entries[i] == (value, workflow_id):
+                    del entries[i]
+
+    def sync(self, workflows: Iterable[Any]) -> None:
+        seen = set()
+        for wf in workflows:
+            seen.add(wf.id)
+            self.add(wf.id, wf.version, wf.trigger)
+        for workflow_id in [w for w in self._versions if w not in seen]:
+            self.remove(workflow_id)
+
+    def candidates(self, event: Dict[str, Any]) -> Set[str]:
+        out = set(self._scan)
+        for path, buckets in self._eq.items():
+            hit = buckets.get(str(lookup(event, self._paths[path])))
+            if hit:
+                out |= hit
+        for table, lower in ((self._lower, True), (self._upper, False)):
+            for path, entries in table.items():
+                try:
+                    x = float(lookup(event, self._paths[path]))
+                except (TypeError, ValueError):
+                    continue
+                if lower:
+                    # thresholds c with c <= x
+                    out.update(w for _, w in entries[:bisect_right(entries, (x, "\uffff"))])
+                else:
+                    out.update(w for _, w in entries[bisect_left(entries, (x, "")):])
+        return out
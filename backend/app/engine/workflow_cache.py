@@ -0,0 +1,132 @@
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+from sqlalchemy import func
+from sqlalchemy.orm import Session, load_only
+
+from ..kv import get_redis
+from ..models import Workflow
+from .graph import get_compiled
+from . import triggers
+from .triggers import TriggerIndex, get_trigger
+
+CHANNEL = "workflows:changed"
+# fallback when a pub/sub message is missed: re-check a cheap fingerprint this often
+CHECK_SECONDS = float(os.getenv("WORKFLOW_CACHE_CHECK_SECONDS", "5"))
+
+@dataclass(frozen=True)
+class ActiveWorkflow:
+    id: str
+    version: int
+    trigger: Any
+    graph: Dict[str, Any]
+    start: Optional[str]
+
+class ActiveWorkflowCache:
+    """Per-process snapshot of active workflows, invalidated over Redis pub/sub."""
+
+    def __init__(self) -> None:
+        self._workflows: Dict[str, ActiveWorkflow] = {}
+        # replaced wholesale, never mutated once published (see TriggerIndex)
+        self._index = TriggerIndex()
+        self._fingerprint: Any = None
+        self._checked_at = 0.0
+        self._dirty = True
+        self._lock = threading.Lock()
+        self._listener: Optional[threading.Thread] = None
+        self._pid: Optional[int] = None
+
+    def invalidate(self) -> None:
+        self._dirty = True
+
+    def get(self, db: Session) -> Dict[str, ActiveWorkflow]:
+        self._ensure_listener()
+        if self._stale():
+            with self._lock:
+                if self._stale():
+                    self._refresh(db)
+        return self._workflows
+
+    def candidates(self, db: Session, event: Dict[str, Any]) -> List[ActiveWorkflow]:
+        workflows = self.get(db)
+        index = self._index
+        return [workflows[w] for w in index.candidates(event or {}) if w in workflows]
+
+    def forget(self, workflow_id: str) -> None:
+        with self._lock:
+            triggers.forget(workflow_id)
+            index = self._index.copy()
+            index.remove(workflow_id)
+            self._index = index
+            self._workflows = {w: wf for w, wf in self._workflows.items() if w != workflow_id}
+        self.invalidate()
+
+    def _stale(self) -> bool:
+        return self._dirty or time.monotonic() - self._checked_at >= CHECK_SECONDS
+
+    def _refresh(self, db: Session) -> None:
+        fingerprint = tuple(
+            db.query(func.count(Workflow.id), func.max(Workflow.updated_at), func.sum(Workflow.version))
+            .filter(Workflow.is_active == True)
+            .one()
+        )
+        self._checked_at = time.monotonic()
+        if not self._dirty and fingerprint == self._fingerprint:
+            return
+        # clear before loading so an invalidation that races the load is kept
+        self._dirty = False
+        rows = (
+            db.query(Workflow)
+            .options(load_only(Workflow.id, Workflow.version, Workflow.trigger, Workflow.definition, Workflow.persistence))
+            .filter(Workflow.is_active == True)
+            .all()
+        )
+        workflows = {}
+        for wf in rows:
+            get_trigger(wf.id, wf.version, wf.trigger)
+            # same compiled graph (and start node) as POST /executions and the workers
+            compiled = get_compiled(wf.id, wf.version, wf.definition or {}, wf.persistence)
+            workflows[wf.id] = ActiveWorkflow(
+                id=wf.id, version=wf.version, trigger=wf.trigger, graph=wf.definition or {}, start=compiled.start
+            )
+        index = self._index.copy()
+        index.sync(workflows.values())
+        self._index = index
+        self._workflows = workflows
+        self._fingerprint = fingerprint
+        logger.info(f"Loaded {len(workflows)} active workflows")
+
+    def _ensure_listener(self) -> None:
+        # threads do not survive fork, so (re)start one per process
+        if self._pid == os.getpid() and self._listener and self._listener.is_alive():
+            return
+        self._pid = os.getpid()
+        self._listener = threading.Thread(target=self._listen, name="workflow-cache", daemon=True)
+        self._listener.start()
+
+    def _listen(self) -> None:
+        while True:
+            try:
+                pubsub = get_redis().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                # anything published while we were disconnected is lost
+                self.invalidate()
+                for _ in pubsub.listen():
+                    self.invalidate()
+            except Exception as error:
+                logger.warning(f"Workflow cache listener error: {error}")
+                time.sleep(1)
+
+def notify_changed(workflow_id: str) -> None:
+    active_workflows.invalidate()
+    try:
+        get_redis().publish(CHANNEL, workflow_id)
+    except Exception as error:
+        # other processes pick the change up on their next fingerprint check
+        logger.warning(f"Could not publish workflow change: {error}")
+
+active_workflows = ActiveWorkflowCache()
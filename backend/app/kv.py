@@ -0,0 +1,13 @@
+import os
+import redis
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+_client: redis.Redis | None = None
+
+def get_redis() -> redis.Redis:
+    # redis-py pools reset themselves after fork, so one client per process is fine
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(REDIS_URL)
+    return _client
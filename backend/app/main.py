@@ -4,6 +4,7 @@ from .db import init_db
 from .api.workflows import router as workflows_router
 from .api.events import router as events_router
 from .api.executions import router as executions_router
+from .api.metrics import router as metrics_router
 
 app = FastAPI(title="Workflow Orchestration Engine (FastAPI)")
 
@@ -23,3 +24,4 @@ def on_startup():
 app.include_router(workflows_router)
 app.include_router(events_router)
 app.include_router(executions_router)
+app.include_router(metrics_router)
@@ -19,6 +19,11 @@ class StepStatus(str, enum.Enum):
     FAILED = "FAILED"
     SKIPPED = "SKIPPED"
 
+class PersistenceLevel(str, enum.Enum):
+    FULL = "full"            # a Step row per node
+    SUMMARY = "summary"      # step counters on the execution, Step rows only for failures
+    EPHEMERAL = "ephemeral"  # in-process metrics only, Step rows only for failures
+
 class Workflow(Base):
     __tablename__ = "workflows"
     id: Mapped[str] = mapped_column(String, primary_key=True)
@@ -27,21 +32,44 @@ class Workflow(Base):
     definition = Column(JSONB, nullable=False)
     version: Mapped[int] = mapped_column(Integer, default=1)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
+    persistence: Mapped[str] = mapped_column(String, default=PersistenceLevel.FULL.value)
     trigger: Mapped[dict] = mapped_column(JSON, nullable=False)
     graph: Mapped[dict] = mapped_column(JSON, nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     executions: Mapped[list["Execution"]] = relationship("Execution", back_populates="workflow", cascade="all, delete-orphan")
+    versions: Mapped[list["WorkflowVersion"]] = relationship("WorkflowVersion", back_populates="workflow", cascade="all, delete-orphan")
+
+class WorkflowVersion(Base):
+    # immutable snapshot written on every create/update; executions run against one
+    __tablename__ = "workflow_versions"
+    workflow_id: Mapped[str] = mapped_column(String, ForeignKey("workflows.id"), primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, primary_key=True)
+    workflow: Mapped["Workflow"] = relationship("Workflow", back_populates="versions")
+    definition = Column(JSONB, nullable=False)
+    trigger: Mapped[dict] = mapped_column(JSON, nullable=False)
+    persistence: Mapped[str] = mapped_column(String, default=PersistenceLevel.FULL.value)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+def snapshot_version(wf: Workflow) -> WorkflowVersion:
+    return WorkflowVersion(workflow_id=wf.id, version=wf.version, definition=wf.definition, trigger=wf.trigger, persistence=wf.persistence or PersistenceLevel.FULL.value)
 
 class Execution(Base):
     __tablename__ = "executions"
     id: Mapped[str] = mapped_column(String, primary_key=True)
     workflow_id: Mapped[str] = mapped_column(String, ForeignKey("workflows.id"))
     workflow: Mapped["Workflow"] = relationship("Workflow", back_populates="executions")
+    # version the execution started on; the orchestrator runs that snapshot
+    workflow_version: Mapped[int | None] = mapped_column(Integer, nullable=True)
     status: Mapped[ExecutionStatus] = mapped_column(
     Enum(ExecutionStatus, name="executionstatus", create_type=False),
     default=ExecutionStatus.PENDING)
     context: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    # outstanding branches (queued, running or parked on a timer); the execution finishes when it hits 0
+    tokens: Mapped[int] = mapped_column(Integer, default=1)
+    # step counters kept for "summary" persistence
+    steps_succeeded: Mapped[int] = mapped_column(Integer, default=0)
+    steps_failed: Mapped[int] = mapped_column(Integer, default=0)
     started_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
     finished_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -61,3 +89,10 @@ class Step(Base):
     input: Mapped[dict | None] = mapped_column(JSON, nullable=True)
     output: Mapped[dict | None] = mapped_column(JSON, nullable=True)
     error: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+
+class OutboxMessage(Base):
+    # execute_node calls committed with the rows that caused them; published by the outbox relay
+    __tablename__ = "outbox"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    args: Mapped[list] = mapped_column(JSON, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
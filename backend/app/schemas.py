@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Any, Optional, List
+from typing import Any, Optional, List, Literal
 
 class WorkflowCreate(BaseModel):
     name: str
@@ -8,6 +8,7 @@ class WorkflowCreate(BaseModel):
     trigger: dict = Field(default_factory=dict)
     graph: dict = Field(default_factory=dict)
     is_active: bool = True
+    persistence: Literal["full", "summary", "ephemeral"] = "full"
 
 class WorkflowOut(BaseModel):
     id: str
@@ -15,6 +16,7 @@ class WorkflowOut(BaseModel):
     description: Optional[str] = None
     version: int
     is_active: bool
+    persistence: str = "full"
     trigger: dict
     graph: dict
     class Config:
@@ -23,8 +25,11 @@ class WorkflowOut(BaseModel):
 class ExecutionOut(BaseModel):
     id: str
     workflow_id: str
+    workflow_version: Optional[int] = None
     status: str
     context: Optional[dict] = None
+    steps_succeeded: Optional[int] = None
+    steps_failed: Optional[int] = None
     class Config:
         from_attributes = True
 
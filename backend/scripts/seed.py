@@ -1,5 +1,5 @@
 from app.db import SessionLocal, init_db
-from app.models import Workflow
+from app.models import Workflow, snapshot_version
 from app.utils import gen_id
 
 def seed():
@@ -29,8 +29,9 @@ def seed():
     }
     trigger1 = {"and":[ { "==": [ {"var":"lead.source"}, "LinkedIn" ] }, { ">": [ {"var":"lead.score"}, 75 ] } ]}
 
-    wf1 = Workflow(id=gen_id(), name="Lead routing", trigger=trigger1, graph=graph1, definition=graph1, is_active=True)
+    wf1 = Workflow(id=gen_id(), name="Lead routing", trigger=trigger1, graph=graph1, definition=graph1, is_active=True, version=1)
     db.add(wf1)
+    db.add(snapshot_version(wf1))
 
     # Scenario 2: Temperature Control
     graph2 = {
@@ -62,8 +63,9 @@ def seed():
         ]
     }
     trigger2 = {">": [ {"var":"temp"}, 30 ]}
-    wf2 = Workflow(id=gen_id(), name="Temperature control", trigger=trigger2, graph=graph2, definition=graph2, is_active=True)
+    wf2 = Workflow(id=gen_id(), name="Temperature control", trigger=trigger2, graph=graph2, definition=graph2, is_active=True, version=1)
     db.add(wf2)
+    db.add(snapshot_version(wf2))
 
     db.commit()
     print("Seeded 2 workflows.")
@@ -0,0 +1,20 @@
+import pytest
+
+from app.engine.graph import CompiledGraph, first_node
+
+GRAPHS = [
+    {"nodes": [{"id": "alpha"}, {"id": "beta"}, {"id": "gamma"}], "edges": [{"source": "alpha", "target": "gamma"}, {"source": "beta", "target": "gamma"}]},
+    {"nodes": [{"id": "beta"}, {"id": "alpha"}], "edges": []},
+    {"nodes": [{"id": "start"}, {"id": "a"}, {"id": "b"}], "edges": [{"source": "start", "target": "b"}, {"source": "b", "target": "a"}]},
+    {"nodes": [{"id": "start"}, {"id": "a"}], "edges": []},
+    {"nodes": [{"id": "a"}, {"id": "b"}], "edges": [{"source": "a", "target": "b"}, {"source": "b", "target": "a"}]},
+    {"nodes": [], "edges": []},
+]
+
+@pytest.mark.parametrize("graph", GRAPHS)
+def test_start_is_first_root_in_definition_order(graph):
+    assert first_node(graph) == CompiledGraph(graph).start
+
+def test_two_roots_start_at_the_first_defined():
+    assert CompiledGraph(GRAPHS[0]).start == "alpha"
+    assert CompiledGraph(GRAPHS[1]).start == "beta"
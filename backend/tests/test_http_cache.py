@@ -0,0 +1,104 @@
+import json
+import time
+
+import pytest
+
+from app.engine import http_cache
+from app.engine.http_cache import CachePolicy, ResponseCache, cache_key, cacheable_ttl_ms, key_headers
+
+def test_key_headers_adds_credentials():
+    headers = {"Authorization": "Bearer a", "X-Api-Key": "k", "X-Session-Id": "s", "Cookie": "c", "Accept": "json", "X-Tenant": "1"}
+    assert key_headers(headers, ["x-tenant"]) == ["authorization", "cookie", "x-api-key", "x-session-id", "x-tenant"]
+    assert key_headers({}, []) == []
+    assert key_headers(None, ["accept"]) == ["accept"]
+
+def test_cache_key_separates_credentials():
+    def key(headers, body=None):
+        return cache_key("GET", "https://api.test/x", headers, body, key_headers(headers, []))
+    assert key({"Authorization": "a"}) != key({"Authorization": "b"})
+    assert key({"X-Api-Token": "a"}) != key({"X-Api-Token": "b"})
+    assert key({"authorization": "a"}) == key({"Authorization": "a"})
+    # headers outside the key do not split entries
+    assert key({"Accept": "a"}) == key({"Accept": "b"})
+
+def test_cache_key_covers_method_url_vary_and_body():
+    base = cache_key("GET", "https://api.test/x", {"X-Tenant": "1"}, {"a": 1, "b": 2}, ["x-tenant"])
+    assert base == cache_key("GET", "https://api.test/x", {"x-tenant": "1"}, {"b": 2, "a": 1}, ["x-tenant"])
+    assert base != cache_key("POST", "https://api.test/x", {"X-Tenant": "1"}, {"a": 1, "b": 2}, ["x-tenant"])
+    assert base != cache_key("GET", "https://api.test/y", {"X-Tenant": "1"}, {"a": 1, "b": 2}, ["x-tenant"])
+    assert base != cache_key("GET", "https://api.test/x", {"X-Tenant": "2"}, {"a": 1, "b": 2}, ["x-tenant"])
+    assert base != cache_key("GET", "https://api.test/x", {"X-Tenant": "1"}, {"a": 2, "b": 2}, ["x-tenant"])
+
+@pytest.mark.parametrize("status, cache_control, expected", [
+    (200, None, 60000),
+    (204, "", 60000),
+    (301, None, None),
+    (404, None, None),
+    (500, "max-age=600", None),
+    (200, "no-store", None),
+    (200, "No-Cache", None),
+    (200, "private, max-age=600", None),
+    (200, "public, max-age=10", 10000),
+    (200, "max-age=600", 60000),
+    (200, 'max-age="5"', 5000),
+    (200, "max-age=60, s-maxage=2", 2000),
+    (200, "max-age=0", None),
+    (200, "max-age=soon", 60000),
+])
+def test_cacheable_ttl_ms(status, cache_control, expected):
+    assert cacheable_ttl_ms(status, cache_control, 60000) == expected
+
+class _Redis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, px=None):
+        self.data[key] = value
+
+@pytest.fixture
+def redis(monkeypatch):
+    client = _Redis()
+    monkeypatch.setattr(http_cache, "get_redis", lambda: client)
+    return client
+
+def test_local_entries_are_per_node():
+    cache = ResponseCache()
+    policy = CachePolicy(60000, 10, [], False)
+    cache.put("wf:a", "k", policy, {"status": 200}, 60000)
+    assert cache.get("wf:a", "k", policy) == {"status": 200}
+    assert cache.get("wf:b", "k", policy) is None
+
+def test_local_lru_is_bounded_per_node():
+    cache = ResponseCache()
+    policy = CachePolicy(60000, 2, [], False)
+    for key in ("k1", "k2", "k3"):
+        cache.put("wf:a", key, policy, {"key": key}, 60000)
+    assert cache.get("wf:a", "k1", policy) is None
+    assert cache.get("wf:a", "k3", policy) == {"key": "k3"}
+
+def test_shared_entry_is_capped_by_reader_ttl(redis):
+    writer = CachePolicy(3600000, 10, [], True)
+    cache = ResponseCache()
+    cache.put("wf:long", "k", writer, {"status": 200}, 3600000)
+    assert ResponseCache().get("wf:other", "k", CachePolicy(3600000, 10, [], True)) == {"status": 200}
+    # an entry written 50ms ago is too old for a node with ttl_ms 1
+    stored_at, expires_at, result = json.loads(redis.data[http_cache.KEY_PREFIX + "k"])
+    redis.data[http_cache.KEY_PREFIX + "k"] = json.dumps([stored_at - 0.05, expires_at, result])
+    assert ResponseCache().get("wf:short", "k", CachePolicy(1, 10, [], True)) is None
+    assert ResponseCache().get("wf:other", "k", CachePolicy(3600000, 10, [], True)) == {"status": 200}
+
+def test_shared_entry_keeps_reader_expiry_locally(redis):
+    cache = ResponseCache()
+    cache.put("wf:long", "k", CachePolicy(3600000, 10, [], True), {"status": 200}, 3600000)
+    reader = ResponseCache()
+    short = CachePolicy(100, 10, [], True)
+    assert reader.get("wf:short", "k", short) == {"status": 200}
+    expires_at, _ = reader._lrus["wf:short"]["k"]
+    assert expires_at <= time.time() + 0.1
+
+def test_shared_entry_without_write_time_is_a_miss(redis):
+    redis.data[http_cache.KEY_PREFIX + "k"] = json.dumps([time.time() + 60, {"status": 200}])
+    assert ResponseCache().get("wf:a", "k", CachePolicy(60000, 10, [], True)) is None
@@ -0,0 +1,133 @@
+import pytest
+
+# reference implementation: the json_logic module from json-logic-qubit (the
+# original json-logic release only runs on Python 2)
+from json_logic import jsonLogic
+
+from app.engine.logic import compile_logic
+
+DATA = {
+    "a": 1, "b": "2", "s": "web", "t": True, "f": False, "z": 0, "n": None, "lst": [1, 2, 3], "obj": {"x": {"y": 5}},
+    "tags": ["vip", "new"], "items": [{"sku": "A", "qty": 2}, {"sku": "B", "qty": 5}], "empty": [],
+}
+
+CASES = [
+    # var: paths, defaults, missing paths
+    {"var": "a"},
+    {"var": ["a"]},
+    {"var": "obj.x.y"},
+    {"var": "lst.1"},
+    {"var": "missing"},
+    {"var": ["missing", 7]},
+    {"var": ["obj.nope", "dflt"]},
+    {"var": ["n", "dflt"]},
+    {"var": ""},
+    # equality and comparisons, including chains
+    {"==": [{"var": "a"}, "1"]},
+    {"===": [{"var": "a"}, "1"]},
+    {"!=": [{"var": "s"}, "web"]},
+    {"!==": [{"var": "a"}, 1]},
+    {">": [{"var": "b"}, 1]},
+    {">=": [{"var": "a"}, 1]},
+    {"<": [{"var": "a"}, 2]},
+    {"<": [0, {"var": "a"}, 2]},
+    {"<": [0, {"var": "a"}, 1]},
+    {"<=": [1, {"var": "a"}, 1]},
+    {"<=": [2, {"var": "a"}, 3]},
+    {"==": [{"var": "t"}, 1]},
+    # negation
+    {"!": {"var": "z"}},
+    {"!": [{"var": "s"}]},
+    {"!!": [{"var": "lst"}]},
+    {"!!": [{"var": "missing"}]},
+    # in
+    {"in": [{"var": "s"}, ["web", "app"]]},
+    {"in": ["e", {"var": "s"}]},
+    {"in": [4, {"var": "lst"}]},
+    # and/or return the deciding operand
+    {"and": [{"var": "t"}, {"var": "s"}]},
+    {"and": [{"var": "z"}, {"var": "s"}]},
+    {"and": [{"var": "t"}, {"var": "f"}, {"var": "s"}]},
+    {"or": [{"var": "z"}, {"var": "s"}]},
+    {"or": [{"var": "z"}, {"var": "f"}]},
+    {"or": [{"var": "a"}, {"var": "missing"}, {"var": "s"}]},
+    # missing
+    {"missing": ["a", "missing", "obj.x.y"]},
+    {"missing_some": [1, ["a", "missing"]]},
+    {"missing_some": [2, ["a", "missing"]]},
+    # arithmetic, strings, conditionals
+    {"+": [{"var": "a"}, {"var": "b"}]},
+    {"-": [{"var": "a"}]},
+    {"*": [2, {"var": "b"}]},
+    {"/": [{"var": "b"}, 4]},
+    {"%": [7, 3]},
+    {"cat": ["lead:", {"var": "s"}]},
+    {"min": [3, {"var": "a"}, 2]},
+    {"max": [3, {"var": "a"}, 2]},
+    {"if": [{"var": "f"}, "x", {"var": "z"}, "y", "z"]},
+    {"?:": [{"var": "t"}, "yes", "no"]},
+    {"merge": [[1], 2, [3, 4]]},
+    # scoped operators: the second argument sees each item as its data
+    {"some": [{"var": "tags"}, {"==": [{"var": ""}, "vip"]}]},
+    {"some": [{"var": "tags"}, {"==": [{"var": ""}, "gold"]}]},
+    {"some": [{"var": "empty"}, {"var": ""}]},
+    {"some": [{"var": "missing"}, {"var": ""}]},
+    {"all": [{"var": "lst"}, {">=": [{"var": ""}, 1]}]},
+    {"all": [{"var": "lst"}, {">": [{"var": ""}, 1]}]},
+    {"all": [{"var": "empty"}, {"var": ""}]},
+    {"all": [{"var": "s"}, {"var": ""}]},
+    {"none": [{"var": "items"}, {">": [{"var": "qty"}, 10]}]},
+    {"none": [{"var": "items"}, {"==": [{"var": "sku"}, "B"]}]},
+    {"none": [{"var": "missing"}, {"var": ""}]},
+    {"map": [{"var": "lst"}, {"*": [{"var": ""}, 2]}]},
+    {"map": [{"var": "items"}, {"var": "sku"}]},
+    {"map": [{"var": "s"}, {"var": ""}]},
+    {"filter": [{"var": "lst"}, {"%": [{"var": ""}, 2]}]},
+    {"filter": [{"var": "items"}, {">": [{"var": "qty"}, 3]}]},
+    {"reduce": [{"var": "lst"}, {"+": [{"var": "accumulator"}, {"var": "current"}]}, 0]},
+    {"reduce": [{"var": "items"}, {"+": [{"var": "accumulator"}, {"var": "current.qty"}]}, 10]},
+    {"reduce": [{"var": "missing"}, {"var": "current"}, "init"]},
+    {"some": [{"filter": [{"var": "items"}, {"==": [{"var": "sku"}, "A"]}]}, {">=": [{"var": "qty"}, 2]}]},
+    # substr, method, log
+    {"substr": [{"var": "s"}, 1]},
+    {"substr": [{"var": "s"}, -2]},
+    {"substr": [{"var": "s"}, 0, 2]},
+    {"substr": ["lead_created", 0, -8]},
+    {"==": [{"substr": [{"var": "s"}, 0, 1]}, "w"]},
+    {"method": [{"var": "s"}, "upper"]},
+    {"method": ["a,b", "split", [","]]},
+    {"method": [{"var": "s"}, "startswith", ["we"]]},
+    {"log": [{"var": "s"}]},
+    # nesting
+    {"and": [{"==": [{"var": "s"}, "web"]}, {"or": [{">": [{"var": "a"}, 5]}, {"in": [2, {"var": "lst"}]}]}]},
+]
+
+@pytest.mark.parametrize("rule", CASES, ids=[str(c) for c in CASES])
+def test_matches_json_logic(rule):
+    assert compile_logic(rule)(DATA) == jsonLogic(rule, DATA)
+
+def test_and_or_short_circuit():
+    calls = []
+    rule = {"and": [{"var": "z"}, {"var": "a"}]}
+    data = {"z": 0}
+    # a missing key on the right side is never looked up once the left decides
+    class Spy(dict):
+        def __getitem__(self, key):
+            calls.append(key)
+            return super().__getitem__(key)
+        def get(self, key, default=None):
+            calls.append(key)
+            return super().get(key, default)
+    assert compile_logic(rule)(Spy(data)) == 0
+    assert calls == ["z"]
+    calls.clear()
+    assert compile_logic({"or": [{"var": "z"}, {"var": "a"}, {"var": "b"}]})(Spy({"z": 0, "a": 1})) == 1
+    assert calls == ["z", "a"]
+
+def test_method_refuses_private_attributes():
+    with pytest.raises(ValueError):
+        compile_logic({"method": [{"var": "s"}, "__class__"]})(DATA)
+
+def test_rejects_unknown_operator():
+    with pytest.raises(ValueError):
+        compile_logic({"nope": [1]})
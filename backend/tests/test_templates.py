@@ -0,0 +1,34 @@
+from app.engine.graph import CompiledGraph
+from app.engine.templates import RAW_FIELDS, compile_template
+
+SCOPE = {"payload": {"tenant": 42, "lead": {"id": "L1", "score": 7.5}, "tags": ["a"]}, "exec_id": "e1", "node_id": "n1"}
+
+def render(data):
+    return compile_template(data, raw_fields=RAW_FIELDS)(SCOPE)
+
+def test_no_placeholders_compiles_to_none():
+    assert compile_template({"url": "https://x.test", "headers": {"A": "b"}, "body": {"n": 1}}, raw_fields=RAW_FIELDS) is None
+
+def test_headers_render_as_strings():
+    data = render({"headers": {"X-Tenant": "{{payload.tenant}}", "X-Missing": "{{payload.nope}}", "X-Exec": "{{ exec_id }}"}})
+    assert data["headers"] == {"X-Tenant": "42", "X-Missing": "", "X-Exec": "e1"}
+
+def test_url_renders_as_string():
+    assert render({"url": "{{payload.tenant}}"})["url"] == "42"
+    assert render({"url": "https://api.test/leads/{{payload.lead.id}}?t={{payload.tenant}}"})["url"] == "https://api.test/leads/L1?t=42"
+    assert render({"url": "https://api.test/{{payload.nope}}"})["url"] == "https://api.test/"
+
+def test_body_keeps_raw_types():
+    body = render({"body": {"tenant": "{{payload.tenant}}", "lead": "{{payload.lead}}", "tags": ["{{payload.tags}}"], "missing": "{{payload.nope}}", "label": "t-{{payload.tenant}}"}})["body"]
+    assert body == {"tenant": 42, "lead": {"id": "L1", "score": 7.5}, "tags": [["a"]], "missing": None, "label": "t-42"}
+    assert render({"body": "{{payload.lead.score}}"})["body"] == 7.5
+
+def test_raw_fields_only_apply_at_top_level():
+    data = render({"headers": {"body": "{{payload.tenant}}"}, "message": "{{payload.tenant}}"})
+    assert data == {"headers": {"body": "42"}, "message": "42"}
+
+def test_compiled_graph_renders_node_data():
+    graph = CompiledGraph({"nodes": [{"id": "call", "type": "http_call", "data": {
+        "url": "https://api.test/{{payload.lead.id}}", "headers": {"X-Tenant": "{{payload.tenant}}"}, "body": {"tenant": "{{payload.tenant}}"},
+    }}], "edges": []})
+    assert graph.node_data("call", SCOPE) == {"url": "https://api.test/L1", "headers": {"X-Tenant": "42"}, "body": {"tenant": 42}}
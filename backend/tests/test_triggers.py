@@ -0,0 +1,94 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.engine.triggers import TriggerIndex, compile_trigger, extract_predicates
+
+TRIGGERS = {
+    "eq": {"==": [{"var": "type"}, "lead_created"]},
+    "eq_nested": {"==": [{"var": "lead.source"}, "web"]},
+    "eq_flipped": {"===": ["signup", {"var": "type"}]},
+    "lower": {">=": [{"var": "amount"}, 100]},
+    "upper": {"<": [{"var": "amount"}, 10]},
+    "and": {"and": [{"==": [{"var": "type"}, "order"]}, {">": [{"var": "amount"}, 50]}]},
+    "or": {"or": [{"==": [{"var": "type"}, "a"]}, {"<=": [{"var": "score"}, 3]}]},
+    "fallback_in": {"in": [{"var": "type"}, ["x", "y"]]},
+    "fallback_not": {"!": {"var": "flag"}},
+    "fallback_some": {"some": [{"var": "tags"}, {"==": [{"var": ""}, "vip"]}]},
+    "fallback_substr": {"==": [{"substr": [{"var": ["type", ""]}, 0, 5]}, "order"]},
+    "empty": {},
+}
+
+EVENTS = [
+    {},
+    {"type": "lead_created"},
+    {"type": "signup"},
+    {"type": "order", "amount": 75},
+    {"type": "order", "amount": 20},
+    {"amount": 100},
+    {"amount": "150"},
+    {"amount": 5},
+    {"amount": "n/a"},
+    {"lead": {"source": "web"}},
+    {"type": "a", "score": 9},
+    {"type": "b", "score": 3},
+    {"type": "x", "flag": True},
+    {"type": "z", "flag": False},
+    {"tags": ["vip"]},
+    {"type": "order_paid", "tags": ["new"]},
+]
+
+def _workflows(triggers=TRIGGERS):
+    return [SimpleNamespace(id=name, version=1, trigger=trigger) for name, trigger in triggers.items()]
+
+def _scan(event, triggers=TRIGGERS):
+    return {name for name, trigger in triggers.items() if compile_trigger(trigger)(event)}
+
+@pytest.mark.parametrize("event", EVENTS)
+def test_candidates_agree_with_full_scan(event):
+    index = TriggerIndex()
+    index.sync(_workflows())
+    candidates = index.candidates(event)
+    expected = _scan(event)
+    assert expected <= candidates
+    assert {w for w in candidates if compile_trigger(TRIGGERS[w])(event)} == expected
+
+def test_predicate_kinds():
+    assert extract_predicates(TRIGGERS["eq"]) == [("eq", "type", "lead_created")]
+    assert extract_predicates(TRIGGERS["eq_flipped"]) == [("eq", "type", "signup")]
+    assert extract_predicates(TRIGGERS["lower"]) == [("lower", "amount", 100.0)]
+    assert extract_predicates(TRIGGERS["upper"]) == [("upper", "amount", 10.0)]
+    assert extract_predicates(TRIGGERS["and"]) == [("eq", "type", "order")]
+    assert extract_predicates(TRIGGERS["fallback_in"]) is None
+
+def test_fallback_triggers_are_always_candidates():
+    index = TriggerIndex()
+    index.sync(_workflows())
+    assert {"fallback_in", "fallback_not", "fallback_some", "fallback_substr", "empty"} <= index.candidates({})
+
+def test_scoped_and_substr_triggers_match():
+    assert compile_trigger(TRIGGERS["fallback_some"])({"tags": ["vip"]}) is True
+    assert compile_trigger(TRIGGERS["fallback_substr"])({"type": "order_paid"}) is True
+
+def test_sync_removes_and_reindexes():
+    index = TriggerIndex()
+    index.sync(_workflows())
+    changed = dict(TRIGGERS, eq={"==": [{"var": "type"}, "other"]})
+    del changed["lower"]
+    index.sync([SimpleNamespace(id=n, version=2 if n == "eq" else 1, trigger=t) for n, t in changed.items()])
+    assert len(index) == len(changed)
+    assert "eq" not in index.candidates({"type": "lead_created"})
+    assert "eq" in index.candidates({"type": "other"})
+    assert "lower" not in index.candidates({"amount": 1000})
+
+def test_copy_is_independent():
+    index = TriggerIndex()
+    index.sync(_workflows())
+    other = index.copy()
+    other.remove("eq")
+    other.remove("lower")
+    other.add("new", 1, {"==": [{"var": "type"}, "lead_created"]})
+    assert {"eq", "lower"} <= index.candidates({"type": "lead_created", "amount": 500})
+    assert "new" not in index.candidates({"type": "lead_created"})
+    assert "eq" not in other.candidates({"type": "lead_created"})
+    assert "new" in other.candidates({"type": "lead_created"})